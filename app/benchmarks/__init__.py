@@ -0,0 +1,37 @@
+"""
+Benchmarks run with ``python manage.py benchmark <name>``.
+
+Each module in this package exposes ``run(stdout, size, iterations)``.
+The command runs it inside a transaction that is rolled back afterwards,
+so seeded data never persists.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def create_user(email='benchmark@example.com'):
+    """Create and return a user owning the benchmark data."""
+    return get_user_model().objects.create_user(email=email, password='benchmark')
+
+
+def measure(func, iterations):
+    """Return (seconds, queries) per call of func, averaged over iterations."""
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(iterations):
+            func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return elapsed / iterations, len(queries) / iterations
+
+
+def report(stdout, label, seconds, queries=None):
+    """Write one result line."""
+    line = f'{label:<40} {seconds * 1000:9.3f} ms/call'
+    if queries is not None:
+        line += f' {queries:7.2f} queries/call'
+    stdout.write(line)
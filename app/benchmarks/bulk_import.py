@@ -0,0 +1,43 @@
+"""
+Throughput of the bulk NDJSON recipe import.
+
+``--size`` recipes with three tags and five ingredients each, drawn from
+small vocabularies, are imported per run.
+"""
+import io
+import json
+import time
+
+from benchmarks import create_user
+from core.models import Recipe
+from recipe.bulk import RecipeImporter, iter_ndjson
+
+
+def run(stdout, size, iterations):
+    user = create_user()
+    body = ''.join(
+        json.dumps({
+            'title': f'Recipe {i}',
+            'time_in_minutes': i % 120,
+            'price': f'{i % 100}.50',
+            'description': 'Imported recipe',
+            'tags': [{'name': f'Tag {(i + j) % 50}'} for j in range(3)],
+            'ingredients': [{'name': f'Ingredient {(i + j) % 500}'} for j in range(5)],
+        }) + '\n'
+        for i in range(size)
+    ).encode()
+
+    for batch_size in (100, 1000):
+        seconds = 0
+        for _ in range(iterations):
+            Recipe.objects.filter(user=user).delete()
+            start = time.perf_counter()
+            summary = RecipeImporter(user, batch_size=batch_size).run(
+                iter_ndjson(io.BytesIO(body))
+            )
+            seconds += time.perf_counter() - start
+        seconds /= iterations
+        stdout.write(
+            f'{"batch size " + str(batch_size):<40} {seconds * 1000:9.3f} ms/import '
+            f'{summary["created"] / seconds:9.0f} recipes/s'
+        )
@@ -0,0 +1,81 @@
+"""
+Peak memory of validating and rendering an uploaded recipe image.
+
+Every case runs in a forked child so its peak RSS is measured on its own.
+``--size`` is the width of the uploaded JPEG in pixels.
+"""
+import io
+import os
+import resource
+import tempfile
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile, TemporaryUploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+from recipe.images import render_variants
+from recipe.serializers import BoundedImageField
+
+
+def _peak_rss_kb(func, iterations):
+    """Run func in a child process and return (seconds, peak RSS growth in KB)."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        seconds = (time.perf_counter() - start) / iterations
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        os.write(write_fd, f'{seconds} {peak_rss - start_rss}'.encode())
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as pipe:
+        result = pipe.read()
+    os.waitpid(pid, 0)
+    seconds, kilobytes = result.split()
+    return float(seconds), int(kilobytes)
+
+
+def run(stdout, size, iterations):
+    width, height = size, size * 3 // 4
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert('RGB').save(buffer, format='JPEG')
+    content = buffer.getvalue()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'upload.jpg')
+    with open(path, 'wb') as image_file:
+        image_file.write(content)
+
+    def in_memory_upload():
+        upload = SimpleUploadedFile('upload.jpg', content, 'image/jpeg')
+        serializers.ImageField().run_validation(upload)
+
+    def temporary_file_upload():
+        upload = TemporaryUploadedFile('upload.jpg', 'image/jpeg', len(content), None)
+        upload.write(content)
+        upload.seek(0)
+        BoundedImageField().run_validation(upload)
+        upload.close()
+
+    def full_decode():
+        with Image.open(path) as image:
+            image.load()
+
+    cases = [
+        ('ImageField, in memory upload', in_memory_upload),
+        ('BoundedImageField, temporary file', temporary_file_upload),
+        ('full decode', full_decode),
+        ('render_variants', lambda: render_variants(path)),
+    ]
+    stdout.write(f'{width}x{height} JPEG, {len(content)} bytes')
+    for label, func in cases:
+        seconds, kilobytes = _peak_rss_kb(func, iterations)
+        stdout.write(
+            f'{label:<40} {seconds * 1000:9.3f} ms/call {kilobytes / 1024:9.1f} MB peak RSS'
+        )
@@ -0,0 +1,42 @@
+"""
+Render and parse time of recipe list payloads with json and orjson.
+
+``--size`` recipes shaped like the recipe list response, with three tags
+and five ingredients each, are rendered and parsed per call. Run with
+``--size 10000`` for large list payloads.
+"""
+from io import BytesIO
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks import measure, report
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+
+def run(stdout, size, iterations):
+    data = [
+        {
+            'id': i,
+            'title': f'Recipe {i}',
+            'time_in_minutes': i % 120,
+            'price': f'{i % 100}.50',
+            'link': f'https://example.com/recipes/{i}',
+            'tags': [{'id': j, 'name': f'Tag {j}'} for j in range(i % 50, i % 50 + 3)],
+            'ingredients': [
+                {'id': j, 'name': f'Ingredient {j}'} for j in range(i % 500, i % 500 + 5)
+            ],
+        }
+        for i in range(size)
+    ]
+
+    for label, renderer, parser in (
+        ('json', JSONRenderer(), JSONParser()),
+        ('orjson', ORJSONRenderer(), ORJSONParser()),
+    ):
+        body = renderer.render(data)
+        seconds, _ = measure(lambda: renderer.render(data), iterations)
+        report(stdout, f'{label} render', seconds)
+        seconds, _ = measure(lambda: parser.parse(BytesIO(body)), iterations)
+        report(stdout, f'{label} parse', seconds)
@@ -0,0 +1,50 @@
+"""
+Compare JOIN+DISTINCT tag filtering with the semi-join filters.
+"""
+import random
+
+from django.db import connection
+
+from benchmarks import create_user, measure, report
+from core.models import Recipe, Tag
+from recipe.filters import MATCH_ALL, MATCH_ANY, filter_by_related
+
+TAGS = 50
+TAGS_PER_RECIPE = 5
+
+
+def seed(user, size):
+    """Create recipes each linked to a few random tags."""
+    tags = Tag.objects.bulk_create(
+        Tag(user=user, name=f'tag{i}') for i in range(TAGS)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'Recipe {i}') for i in range(size)
+    )
+    rng = random.Random(0)
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in rng.sample(tags, TAGS_PER_RECIPE)
+    )
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe, core_recipe_tags')
+    return [tag.id for tag in tags]
+
+
+def run(stdout, size, iterations):
+    user = create_user()
+    tag_ids = seed(user, size)[:3]
+    base = Recipe.objects.filter(user=user).order_by('id')
+
+    querysets = {
+        'join + distinct (any)': base.filter(tags__id__in=tag_ids).distinct(),
+        'exists (any)': filter_by_related(base, 'tags', tag_ids, MATCH_ANY),
+        'grouped count (all)': filter_by_related(base, 'tags', tag_ids, MATCH_ALL),
+    }
+    for label, queryset in querysets.items():
+        seconds, _ = measure(lambda: list(queryset.values_list('id', flat=True)), iterations)
+        report(stdout, f'{label}: {queryset.count()} rows', seconds)
+        stdout.write(queryset.values('id').explain())
+        stdout.write('')
@@ -0,0 +1,59 @@
+"""
+CPU cost of rendering recipes with the serializers and from values() rows.
+
+``--size`` recipes with three tags and five ingredients each are seeded
+and rendered to JSON, reported as CPU time per 1000 recipes.
+"""
+import time
+
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks import create_user
+from core.models import Ingredient, Recipe, Tag
+from recipe.rows import RecipeRowSerializer
+from recipe.serializers import RecipeSerializer
+
+
+def run(stdout, size, iterations):
+    user = create_user()
+    tags = Tag.objects.bulk_create(Tag(user=user, name=f'Tag {i}') for i in range(50))
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Ingredient {i}') for i in range(500)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(user=user, title=f'Recipe {i}', time_in_minutes=i % 120, price=f'{i % 100}.50')
+        for i in range(size)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tags[(i + j) % 50].id)
+        for i, recipe in enumerate(recipes) for j in range(3)
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=recipe.id, ingredient_id=ingredients[(i + j) % 500].id,
+        )
+        for i, recipe in enumerate(recipes) for j in range(5)
+    )
+    queryset = Recipe.objects.filter(user=user).order_by('id')
+    renderer = JSONRenderer()
+
+    def serializer():
+        prefetched = queryset.defer('description', 'search_vector').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+        )
+        return renderer.render(RecipeSerializer(prefetched, many=True).data)
+
+    rows = RecipeRowSerializer(RecipeSerializer.Meta.fields)
+
+    def row_serializer():
+        return renderer.render(rows.serialize(rows.values(queryset)))
+
+    assert serializer() == row_serializer()
+    for label, func in (('serializer', serializer), ('rows', row_serializer)):
+        start = time.process_time()
+        for _ in range(iterations):
+            func()
+        seconds = (time.process_time() - start) / iterations
+        stdout.write(f'{label:<40} {seconds * 1000 / size * 1000:9.3f} ms CPU/1k recipes')
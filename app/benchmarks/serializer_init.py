@@ -0,0 +1,32 @@
+"""
+Cost of instantiating recipe serializers and building their fields.
+
+Compares the cached field templates of ``CachedFieldsModelSerializer``
+against rebuilding the fields through ``ModelSerializer.get_fields()``.
+``--size`` is unused.
+"""
+from rest_framework import serializers
+
+from benchmarks import measure, report
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
+
+
+def _uncached(serializer_class):
+    """Return a subclass rebuilding its fields on every instantiation."""
+
+    def get_fields(self):
+        return serializers.ModelSerializer.get_fields(self)
+
+    return type(f'Uncached{serializer_class.__name__}', (serializer_class,), {
+        'get_fields': get_fields,
+    })
+
+
+def run(stdout, size, iterations):
+    for serializer_class in (RecipeSerializer, RecipeDetailSerializer):
+        for label, cls in (
+            ('rebuilt', _uncached(serializer_class)),
+            ('cached', serializer_class),
+        ):
+            seconds, _ = measure(lambda: cls().fields, iterations)
+            report(stdout, f'{serializer_class.__name__} {label}', seconds)
@@ -0,0 +1,28 @@
+"""
+Compare DRF token authentication with the cached variant.
+"""
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmarks import create_user, measure, report
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+def run(stdout, size, iterations):
+    user = create_user()
+    token = Token.objects.create(user=user)
+    request = APIRequestFactory().get(
+        '/api/recipe/recipes/', HTTP_AUTHORIZATION=f'Token {token.key}'
+    )
+
+    for auth_class in (TokenAuthentication, CachedTokenAuthentication):
+        token_cache.clear()
+        authentication = auth_class()
+        seconds, queries = measure(
+            lambda: authentication.authenticate(Request(request)), iterations
+        )
+        report(stdout, auth_class.__name__, seconds, queries)
+
+    stdout.write(f'cache stats: {token_cache.stats()}')
@@ -2,6 +2,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from core import models
+from core.pagination import EstimatedCountPaginator
 from django.utils.translation import gettext_lazy as _
 
 
@@ -35,7 +36,13 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class EstimatedCountAdmin(admin.ModelAdmin):
+    """Admin for large tables that avoids full COUNT(*) queries"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Recipe, EstimatedCountAdmin)
+admin.site.register(models.Tag, EstimatedCountAdmin)
+admin.site.register(models.Ingredient, EstimatedCountAdmin)
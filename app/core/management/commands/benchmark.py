@@ -0,0 +1,34 @@
+"""
+Django command to run a benchmark from the benchmarks package.
+"""
+import importlib
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    """Django command to run a benchmark and roll back its data."""
+    help = 'Run benchmarks.<name> inside a rolled back transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Module name in the benchmarks package.')
+        parser.add_argument('--size', type=int, default=1000,
+                            help='Number of rows to seed.')
+        parser.add_argument('--iterations', type=int, default=100,
+                            help='Number of timed calls.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        try:
+            module = importlib.import_module(f'benchmarks.{options["name"]}')
+        except ModuleNotFoundError:
+            raise CommandError(f'Unknown benchmark "{options["name"]}".')
+
+        with transaction.atomic():
+            module.run(
+                self.stdout,
+                size=options['size'],
+                iterations=options['iterations'],
+            )
+            transaction.set_rollback(True)
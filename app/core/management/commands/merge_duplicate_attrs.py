@@ -0,0 +1,78 @@
+"""
+Django command to merge tags and ingredients sharing a name per user.
+"""
+from functools import reduce
+from operator import or_
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Merge duplicate tags and ingredients into their oldest row.
+
+    Recipe links of the duplicates are moved to the kept row. Each batch
+    of duplicate groups commits on its own, so large tables can be cleaned
+    up ahead of adding the per-user name uniqueness constraint without one
+    long transaction.
+    """
+    help = 'Merge tags and ingredients that share a name for the same user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of duplicate groups merged per transaction.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the duplicate groups.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for field_name in ('tags', 'ingredients'):
+            field = Recipe._meta.get_field(field_name)
+            groups = list(
+                field.related_model.objects.values('user_id', 'name')
+                .annotate(keep_id=Min('id'), total=Count('id'))
+                .filter(total__gt=1)
+                .order_by('user_id', 'name')
+            )
+            merged = 0
+            if not options['dry_run']:
+                batch_size = options['batch_size']
+                for start in range(0, len(groups), batch_size):
+                    merged += self._merge(field, groups[start:start + batch_size])
+            self.stdout.write(
+                f'{field.related_model._meta.verbose_name_plural}: '
+                f'{len(groups)} duplicate groups, {merged} rows merged'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def _merge(self, field, groups):
+        """Merge one batch of duplicate groups and return the rows removed."""
+        model = field.related_model
+        through = field.remote_field.through
+        target = f'{field.m2m_reverse_field_name()}_id'
+        keep_ids = {(group['user_id'], group['name']): group['keep_id'] for group in groups}
+
+        with transaction.atomic():
+            rows = model.objects.filter(
+                reduce(or_, (Q(user_id=user_id, name=name) for user_id, name in keep_ids))
+            ).values_list('id', 'user_id', 'name')
+            remap = {
+                row_id: keep_ids[(user_id, name)]
+                for row_id, user_id, name in rows
+                if row_id != keep_ids[(user_id, name)]
+            }
+            links = through.objects.filter(**{f'{target}__in': remap})
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe_id, **{target: remap[attr_id]})
+                    for recipe_id, attr_id in links.values_list('recipe_id', target)
+                ],
+                ignore_conflicts=True,
+            )
+            model.objects.filter(id__in=remap).delete()
+
+        return len(remap)
@@ -0,0 +1,85 @@
+"""
+Django command to move recipe images to content addressed blobs.
+"""
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.models import ContentVersion, ImageBlob, Recipe
+
+
+class Command(BaseCommand):
+    """Store every recipe image once per content and recount references.
+
+    Images that are not blobs yet are hashed and stored under their content
+    hash, recipes are repointed per batch and the old files are deleted
+    once their batch commits. Blob reference counts are then recounted from
+    the recipes and unreferenced blobs are deleted.
+    """
+    help = 'Move recipe images to content addressed storage.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of recipes moved per transaction.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report the images to move.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        pending = list(
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .exclude(image__in=ImageBlob.objects.values('name'))
+            .order_by('id').values_list('id', flat=True)
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{len(pending)} recipe images to move')
+            return
+
+        moved = missing = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(pending), batch_size):
+            batch_moved, batch_missing = self._move(pending[start:start + batch_size])
+            moved += batch_moved
+            missing += batch_missing
+
+        references = Recipe.objects.filter(image=OuterRef('name')).order_by().values(
+            'image'
+        ).annotate(total=Count('id')).values('total')
+        ImageBlob.objects.update(ref_count=Coalesce(Subquery(references), 0))
+        unreferenced = list(
+            ImageBlob.objects.filter(ref_count=0).values_list('name', flat=True)
+        )
+        for name in unreferenced:
+            ImageBlob.objects.collect(name)
+
+        self.stdout.write(
+            f'{moved} recipe images moved, {missing} missing, '
+            f'{len(unreferenced)} unreferenced blobs deleted'
+        )
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def _move(self, recipe_ids):
+        """Move one batch of images and return (moved, missing) counts."""
+        old_names = set()
+        moved = missing = 0
+        with transaction.atomic():
+            recipes = Recipe.objects.select_for_update().filter(id__in=recipe_ids)
+            for recipe_id, user_id, name in recipes.values_list('id', 'user_id', 'image'):
+                if not default_storage.exists(name):
+                    missing += 1
+                    continue
+                with default_storage.open(name) as file:
+                    blob = ImageBlob.objects.acquire(file)
+                Recipe.objects.filter(id=recipe_id).update(image=blob.name)
+                ContentVersion.objects.bump(user_id)
+                old_names.add(name)
+                moved += 1
+
+        still_used = set(
+            Recipe.objects.filter(image__in=old_names).values_list('image', flat=True)
+        )
+        for name in old_names - still_used:
+            default_storage.delete(name)
+        return moved, missing
@@ -0,0 +1,44 @@
+"""
+Responses serving files stored under MEDIA_ROOT
+"""
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+
+
+def media_file_response(name, content_type=None, file=None):
+    """Return a response serving the file stored under a media name.
+
+    With ``MEDIA_ACCEL_REDIRECT_PREFIX`` set, the response is empty and
+    tells nginx to send the file from its internal location, so the bytes
+    never pass through the application server. Otherwise Django streams
+    the file itself, or ``file`` when the caller already opened it. Its
+    length is then read from the open file rather than the path, which may
+    be gone by now.
+    """
+    if content_type is None:
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+    if prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f'{prefix.rstrip("/")}/{quote(name)}'
+        if file is not None:
+            file.close()
+        return response
+
+    if file is not None:
+        response = FileResponse(
+            file, content_type=content_type, filename=os.path.basename(name)
+        )
+        response['Content-Length'] = os.fstat(file.fileno()).st_size
+        return response
+
+    try:
+        file = open(os.path.join(settings.MEDIA_ROOT, name), 'rb')
+    except FileNotFoundError:
+        raise Http404
+    return FileResponse(file, content_type=content_type)
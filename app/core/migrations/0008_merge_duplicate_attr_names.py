@@ -0,0 +1,45 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:24
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge rows sharing a (user, name) pair into the oldest one."""
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name in ('tags', 'ingredients'):
+        field = Recipe._meta.get_field(field_name)
+        model = field.related_model
+        through = field.remote_field.through
+        target = f'{model._meta.model_name}_id'
+
+        duplicates = (
+            model.objects.values('user_id', 'name')
+            .annotate(keep_id=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for group in duplicates:
+            dup_ids = list(
+                model.objects.filter(user_id=group['user_id'], name=group['name'])
+                .exclude(id=group['keep_id'])
+                .values_list('id', flat=True)
+            )
+            linked = through.objects.filter(**{target: group['keep_id']})
+            through.objects.filter(**{f'{target}__in': dup_ids}).filter(
+                recipe_id__in=linked.values('recipe_id')
+            ).delete()
+            through.objects.filter(**{f'{target}__in': dup_ids}).update(
+                **{target: group['keep_id']}
+            )
+            model.objects.filter(id__in=dup_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
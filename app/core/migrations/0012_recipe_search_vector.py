@@ -0,0 +1,56 @@
+# Generated by Django 4.0.10 on 2026-10-18 02:33
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, TextField
+
+SEARCH_CONFIG = 'english'
+
+
+def create_search_index(apps, schema_editor):
+    """Index and backfill search vectors on PostgreSQL only."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector_idx ON core_recipe USING gin (search_vector)'
+    )
+
+    Recipe = apps.get_model('core', 'Recipe')
+    vector = SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    for field_name in ('tags', 'ingredients'):
+        field = Recipe._meta.get_field(field_name)
+        names = (
+            field.remote_field.through.objects
+            .filter(recipe_id=OuterRef('pk'))
+            .values('recipe_id')
+            .annotate(names=StringAgg(f'{field.m2m_reverse_field_name()}__name', ' '))
+            .values('names')
+        )
+        vector += SearchVector(
+            Subquery(names, output_field=TextField()), weight='B', config=SEARCH_CONFIG
+        )
+    vector += SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    Recipe.objects.update(search_vector=vector)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_contentversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
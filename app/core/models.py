@@ -1,10 +1,14 @@
 """
 Database models
 """
+import hashlib
 import uuid
 import os
+from functools import partial
 
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -19,6 +23,34 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads', 'recipe', filename)
 
 
+# File extensions for the formats Pillow reports. Multi picture JPEGs from
+# phone cameras report MPO but are served and decoded as JPEG.
+IMAGE_FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'MPO': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+    'BMP': '.bmp',
+    'TIFF': '.tiff',
+}
+
+
+def image_blob_path(digest, ext):
+    """Return the content addressed path of an image blob"""
+    return os.path.join('uploads', 'recipe', digest[:2], f'{digest}{ext}')
+
+
+def file_sha256(file):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
 class UserManager(BaseUserManager):
     """Manager for users"""
 
@@ -51,8 +83,57 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class ContentVersionManager(models.Manager):
+    """Manager for per-user content versions."""
+
+    def current(self, user_id):
+        """Return the content version for a user, starting it at zero."""
+        version = self.filter(user_id=user_id).values_list('version', flat=True).first()
+        if version is None:
+            self.bulk_create([self.model(user_id=user_id)], ignore_conflicts=True)
+            version = self.filter(user_id=user_id).values_list('version', flat=True).get()
+        return version
+
+    def bump(self, user_id):
+        """Increment the content version of a user, if it was ever read."""
+        self.filter(user_id=user_id).update(version=models.F('version') + 1)
+
+
+class RecipeAttrManager(models.Manager):
+    """Manager for per-user named recipe attributes."""
+
+    def get_or_create_many(self, user, names):
+        """Return a name to id mapping, creating missing names in bulk."""
+        names = set(names)
+        if not names:
+            return {}
+
+        ids = dict(
+            self.filter(user=user, name__in=names).values_list('name', 'id')
+        )
+        missing = names.difference(ids)
+        if missing:
+            self.bulk_create(
+                [self.model(user=user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            ids.update(
+                self.filter(user=user, name__in=missing).values_list('name', 'id')
+            )
+        return ids
+
+
 class Recipe(models.Model):
     """Recipe object."""
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -65,6 +146,18 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(
+        max_length=10,
+        choices=IMAGE_STATUS_CHOICES,
+        blank=True,
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -78,6 +171,16 @@ class Tag(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -91,5 +194,124 @@ class Ingredient(models.Model):
 
     )
 
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ContentVersion(models.Model):
+    """Counter bumped whenever a user's recipes, tags or ingredients change."""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='content_version',
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    objects = ContentVersionManager()
+
+    def __str__(self):
+        return f'{self.user_id}:{self.version}'
+
+
+class ImageBlobManager(models.Manager):
+    """Manager for reference counted image blobs."""
+
+    def acquire(self, file, sha256=None):
+        """Return the blob holding a file's bytes and take a reference to it.
+
+        The file is only written when no blob with the same content exists.
+        """
+        digest = sha256 or getattr(file, 'sha256', None) or file_sha256(file)
+        image = getattr(file, 'image', None)
+        ext = IMAGE_FORMAT_EXTENSIONS.get(getattr(image, 'format', None))
+        if ext is None:
+            ext = os.path.splitext(file.name)[1].lower()
+
+        with transaction.atomic():
+            blob = self._insert_and_lock(digest, image_blob_path(digest, ext), file.size)
+            if not default_storage.exists(blob.name):
+                file.seek(0)
+                default_storage.save(blob.name, file)
+            self.filter(sha256=digest).update(ref_count=models.F('ref_count') + 1)
+        blob.ref_count += 1
+        return blob
+
+    def release(self, name):
+        """Drop a reference to the blob stored under a name, if any.
+
+        Blobs left without references are deleted once the transaction
+        commits.
+        """
+        released = self.filter(name=name, ref_count__gt=0).update(
+            ref_count=models.F('ref_count') - 1
+        )
+        if released:
+            transaction.on_commit(partial(self.collect, name))
+
+    def collect(self, name):
+        """Delete the blob stored under a name if nothing references it.
+
+        Files derived from the blob and stored next to it, named after its
+        digest, are deleted along with it once the row delete committed.
+        """
+        with transaction.atomic():
+            blob = self.select_for_update().filter(name=name, ref_count=0).first()
+            if blob is None:
+                return
+            digest = blob.sha256
+            blob.delete()
+        self._delete_files(digest, name)
+
+    def _delete_files(self, digest, name):
+        """Delete a collected blob's files unless it was acquired again."""
+        with transaction.atomic():
+            # Holding the blob's row makes acquire() wait instead of reusing
+            # files that are being deleted.
+            blob = self._insert_and_lock(digest, name, 0)
+            if blob.ref_count:
+                return
+            directory = os.path.dirname(name)
+            _, filenames = default_storage.listdir(directory)
+            for filename in filenames:
+                if filename.startswith(digest):
+                    default_storage.delete(os.path.join(directory, filename))
+            blob.delete()
+
+    def _insert_and_lock(self, digest, name, size, attempts=3):
+        """Return the blob row for a digest, created if missing and locked.
+
+        A concurrent collect may delete the row between the insert and the
+        lock, in which case the insert is retried.
+        """
+        for _ in range(attempts):
+            self.bulk_create(
+                [self.model(sha256=digest, name=name, size=size)], ignore_conflicts=True,
+            )
+            blob = self.select_for_update().filter(sha256=digest).first()
+            if blob is not None:
+                return blob
+        raise self.model.DoesNotExist(f'Image blob {digest} was deleted while acquired.')
+
+
+class ImageBlob(models.Model):
+    """Uploaded image content shared by every recipe using the same bytes."""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+
+    objects = ImageBlobManager()
+
     def __str__(self):
         return self.name
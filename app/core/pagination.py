@@ -0,0 +1,101 @@
+"""
+Paginators shared by the API and the admin
+"""
+import json
+
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+def planner_row_estimate(queryset):
+    """Return the planner's row estimate for a queryset, or None.
+
+    Only PostgreSQL exposes a cheap estimate through EXPLAIN, other
+    backends return None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPage(Page):
+    """Page that does not trust an estimated total for its next link."""
+
+    def has_next(self):
+        if self.paginator.count_is_exact:
+            return super().has_next()
+        return len(self.object_list) >= self.paginator.per_page
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that only counts exactly up to a threshold.
+
+    Result sets up to ``exact_count_threshold`` rows are counted exactly.
+    Past that, PostgreSQL returns the planner estimate and other backends
+    count at most ``count_limit`` rows. ``count_is_exact`` tells which one
+    was used.
+    """
+    exact_count_threshold = 1000
+    count_limit = 100000
+
+    @cached_property
+    def count(self):
+        """Return the exact or estimated number of objects."""
+        self._count_is_exact = True
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+
+        queryset = self.object_list.order_by()
+        count = queryset[:self.exact_count_threshold + 1].count()
+        if count <= self.exact_count_threshold:
+            return count
+
+        estimate = planner_row_estimate(queryset)
+        if estimate is None:
+            count = queryset[:self.count_limit + 1].count()
+            if count <= self.count_limit:
+                return count
+            estimate = self.count_limit
+
+        self._count_is_exact = False
+        return max(estimate, self.exact_count_threshold + 1)
+
+    @property
+    def count_is_exact(self):
+        """Whether ``count`` is an exact row count."""
+        # Evaluating count records which strategy produced it.
+        self.count
+        return self._count_is_exact
+
+    def validate_number(self, number):
+        """Allow pages past an estimated total, which may be too low."""
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            number = int(number)
+            if self.count_is_exact or number < 1:
+                raise
+            return number
+
+    def page(self, number):
+        """Return a page, without clamping it to an estimated total."""
+        if self.count_is_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedCountPage(*args, **kwargs)
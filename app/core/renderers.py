@@ -0,0 +1,136 @@
+"""
+Renderers shared by the API
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# Passing datetimes through to the encoder keeps DRF's formatting of them.
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON renderer encoding with orjson when it is installed.
+
+    Output decodes to what ``JSONRenderer`` sends with the default compact,
+    unicode and strict settings: types orjson does not handle natively go
+    through DRF's encoder and U+2028/U+2029 are escaped. Only float
+    exponents are spelled differently, ``1e16`` rather than ``1e+16`` and
+    ``1e-7`` rather than ``1e-07``. Indented output, other settings, a
+    missing orjson and payloads orjson rejects, such as integers over 64
+    bits, fall back to ``JSONRenderer``. Non-finite floats, which DRF
+    serializers never produce, render as null.
+    """
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or not self.compact or self.ensure_ascii or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def _columns(rows):
+    """Return every key of a list of dicts in first seen order, or None."""
+    if not all(isinstance(row, dict) for row in rows):
+        return None
+    columns = {}
+    for row in rows:
+        columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+def _is_related(value):
+    """Whether a value is a list of objects with an id, like nested tags."""
+    return (isinstance(value, list) and bool(value)
+            and all(isinstance(item, dict) and 'id' in item for item in value))
+
+
+def to_columnar(rows):
+    """Return a list of dicts as one key list plus value rows.
+
+    Lists of objects with an ``id``, like nested tags, are replaced by
+    their ids and each object is listed once in a columnar side table
+    under ``related``. Keys missing from a dict are sent as null, and an
+    empty list has no columns. Lists holding anything but dicts, like
+    error messages, are returned unchanged.
+    """
+    columns = _columns(rows)
+    if columns is None:
+        return rows
+
+    related = {}
+    values = []
+    for row in rows:
+        value_row = []
+        for name in columns:
+            value = row.get(name)
+            if _is_related(value):
+                table = related.setdefault(name, {})
+                for item in value:
+                    table.setdefault(item['id'], item)
+                value = [item['id'] for item in value]
+            value_row.append(value)
+        values.append(value_row)
+
+    return {
+        'columns': columns,
+        'rows': values,
+        'related': {
+            name: to_columnar(list(table.values())) for name, table in related.items()
+        },
+    }
+
+
+class ColumnarJSONRenderer(ORJSONRenderer):
+    """JSON renderer sending lists in columnar form.
+
+    A list response, or the ``results`` of a paginated one, is rendered
+    through ``to_columnar``, so keys are sent once instead of per object
+    and nested objects once per response. Other responses render as
+    plain JSON.
+    """
+    media_type = 'application/vnd.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            data = to_columnar(data)
+        elif isinstance(data, dict) and isinstance(data.get('results'), list):
+            data = {**data, 'results': to_columnar(data['results'])}
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer encoding responses as MessagePack.
+
+    Types MessagePack has no encoding for go through DRF's JSON encoder,
+    so values decode to what the JSON renderers send. Requires the
+    optional msgpack package.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.encoder.default, use_bin_type=True)
@@ -5,6 +5,8 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
+from core import models
+from core.pagination import EstimatedCountPaginator
 
 
 class AdminSiteTests(TestCase):
@@ -45,3 +47,11 @@ class AdminSiteTests(TestCase):
         url = reverse('admin:core_user_add')
         res = self.client.get(url)
         self.assertEqual(res.status_code, 200)
+
+    def test_tags_list_uses_estimated_count(self):
+        """Test the tag changelist is served by the estimated count paginator"""
+        models.Tag.objects.create(user=self.user, name='Vegan')
+        url = reverse('admin:core_tag_changelist')
+        res = self.client.get(url)
+        self.assertContains(res, 'Vegan')
+        self.assertIsInstance(res.context['cl'].paginator, EstimatedCountPaginator)
@@ -1,7 +1,14 @@
-from django.test import SimpleTestCase
+from io import StringIO
+from django.test import SimpleTestCase, TestCase
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2OpError
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from core.models import ImageBlob, Recipe
 from django.db.utils import OperationalError
 
 
@@ -26,3 +33,54 @@ class CommandTests(SimpleTestCase):
         print('a')
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class BenchmarkCommandTests(TestCase):
+    """Test the benchmark command."""
+
+    def test_benchmark_rolls_back(self):
+        """Test a benchmark reports results and leaves no data behind."""
+        out = StringIO()
+
+        call_command('benchmark', 'token_auth', iterations=2, stdout=out)
+
+        self.assertIn('CachedTokenAuthentication', out.getvalue())
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_unknown_benchmark(self):
+        """Test an unknown benchmark name raises an error."""
+        with self.assertRaises(CommandError):
+            call_command('benchmark', 'does_not_exist')
+
+
+class MigrateRecipeImagesCommandTests(TestCase):
+    """Test moving recipe images to content addressed blobs."""
+
+    def test_migrate_recipe_images(self):
+        """Test duplicate images are stored once and old files deleted."""
+        user = get_user_model().objects.create_user('user@example.com', 'pass123')
+        recipes = [
+            Recipe.objects.create(user=user, title=f'Recipe {i}') for i in range(3)
+        ]
+        for recipe in recipes[:2]:
+            recipe.image.save('photo.jpg', ContentFile(b'same bytes'))
+        recipes[2].image.save('other.jpg', ContentFile(b'other bytes'))
+        old_names = [recipe.image.name for recipe in recipes]
+        out = StringIO()
+
+        call_command('migrate_recipe_images', batch_size=2, stdout=out)
+
+        for recipe in recipes:
+            recipe.refresh_from_db()
+        self.assertEqual(recipes[0].image.name, recipes[1].image.name)
+        self.assertNotEqual(recipes[0].image.name, recipes[2].image.name)
+        self.assertEqual(
+            dict(ImageBlob.objects.values_list('name', 'ref_count')),
+            {recipes[0].image.name: 2, recipes[2].image.name: 1},
+        )
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+        self.assertIn('3 recipe images moved', out.getvalue())
+
+        for recipe in recipes:
+            recipe.image.delete(save=False)
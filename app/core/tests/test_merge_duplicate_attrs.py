@@ -0,0 +1,64 @@
+"""
+Tests for merging duplicate tags and ingredients
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from core import models
+
+
+class MergeDuplicateAttrsTests(TransactionTestCase):
+    """Test the merge_duplicate_attrs command."""
+
+    def setUp(self):
+        self.constraint = next(
+            c for c in models.Tag._meta.constraints
+            if c.name == 'unique_tag_name_per_user'
+        )
+        # SQLite rebuilds the table from Meta, so hide the constraint there too.
+        with patch.object(models.Tag._meta, 'constraints', []):
+            with connection.schema_editor() as editor:
+                editor.remove_constraint(models.Tag, self.constraint)
+        self.user = get_user_model().objects.create_user(
+            "test@example.com",
+            "testing321")
+
+    def tearDown(self):
+        models.Tag.objects.all().delete()
+        with connection.schema_editor() as editor:
+            editor.add_constraint(models.Tag, self.constraint)
+
+    def test_merge_moves_links_to_oldest(self):
+        """Test duplicates are merged and their recipe links kept"""
+        keep = models.Tag.objects.create(user=self.user, name='Vegan')
+        dup = models.Tag.objects.create(user=self.user, name='Vegan')
+        other = models.Tag.objects.create(user=self.user, name='Quick')
+        linked_to_both = models.Recipe.objects.create(user=self.user, title='Bowl')
+        linked_to_dup = models.Recipe.objects.create(user=self.user, title='Stew')
+        linked_to_both.tags.add(keep, dup, other)
+        linked_to_dup.tags.add(dup)
+        out = StringIO()
+
+        call_command('merge_duplicate_attrs', batch_size=1, stdout=out)
+
+        self.assertFalse(models.Tag.objects.filter(id=dup.id).exists())
+        self.assertEqual(
+            set(linked_to_both.tags.values_list('id', flat=True)), {keep.id, other.id}
+        )
+        self.assertEqual(list(linked_to_dup.tags.values_list('id', flat=True)), [keep.id])
+        self.assertIn('tags: 1 duplicate groups, 1 rows merged', out.getvalue())
+
+    def test_dry_run_changes_nothing(self):
+        """Test a dry run only reports duplicates"""
+        models.Tag.objects.create(user=self.user, name='Vegan')
+        models.Tag.objects.create(user=self.user, name='Vegan')
+        out = StringIO()
+
+        call_command('merge_duplicate_attrs', dry_run=True, stdout=out)
+
+        self.assertEqual(models.Tag.objects.count(), 2)
+        self.assertIn('tags: 1 duplicate groups, 0 rows merged', out.getvalue())
@@ -1,10 +1,16 @@
 """
 Tests for models
 """
+import hashlib
+from types import SimpleNamespace
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
 from decimal import Decimal
+from django.db import DatabaseError, IntegrityError
 from unittest.mock import patch
 
 
@@ -85,6 +91,46 @@ class ModelTests(TestCase):
         )
         self.assertEqual(str(res), res.name)
 
+    def test_tag_name_unique_per_user(self):
+        """Test a user cannot have two tags with the same name"""
+        user = get_user_model().objects.create_user(
+            "test@example.com",
+            "testing321")
+        other_user = get_user_model().objects.create_user(
+            "other@example.com",
+            "testing321")
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(user=other_user, name='Vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
+    def test_get_or_create_many(self):
+        """Test resolving attribute names creates only the missing ones"""
+        user = get_user_model().objects.create_user(
+            "test@example.com",
+            "testing321")
+        existing = models.Ingredient.objects.create(user=user, name='salt')
+
+        ids = models.Ingredient.objects.get_or_create_many(
+            user, ['salt', 'pepper', 'pepper']
+        )
+
+        self.assertEqual(set(ids), {'salt', 'pepper'})
+        self.assertEqual(ids['salt'], existing.id)
+        self.assertEqual(models.Ingredient.objects.filter(user=user).count(), 2)
+
+    def test_content_version(self):
+        """Test content versions start at zero and only bump once read"""
+        user = get_user_model().objects.create_user(
+            "test@example.com",
+            "testing321")
+        models.ContentVersion.objects.bump(user.id)
+        self.assertEqual(models.ContentVersion.objects.current(user.id), 0)
+
+        models.ContentVersion.objects.bump(user.id)
+        self.assertEqual(models.ContentVersion.objects.current(user.id), 1)
+
     @patch("core.models.uuid.uuid4")
     def test_recipe_file_path_name(self, mock_uuid):
         """Test for generating file_path_name"""
@@ -93,3 +139,85 @@ class ModelTests(TestCase):
         file_path = models.recipe_image_file_path(None, "example.jpg")
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+    def test_image_blob_acquire_retries_collected_row(self):
+        """Test acquiring survives the row being collected before the lock"""
+        content = ContentFile(b'image bytes', name='photo.jpg')
+        bulk_create = models.ImageBlobManager.bulk_create
+        calls = []
+
+        def collected_once(manager, *args, **kwargs):
+            # The first insert is lost as if a collect deleted the row.
+            calls.append(args)
+            if len(calls) > 1:
+                return bulk_create(manager, *args, **kwargs)
+            return []
+
+        with patch.object(models.ImageBlobManager, 'bulk_create', collected_once):
+            blob = models.ImageBlob.objects.acquire(content)
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(models.ImageBlob.objects.get(pk=blob.pk).ref_count, 1)
+
+    def test_image_blob_collect_keeps_reacquired_files(self):
+        """Test files of a blob acquired again during collection are kept"""
+        content = ContentFile(b'image bytes', name='photo.jpg')
+        blob = models.ImageBlob.objects.acquire(content)
+        models.ImageBlob.objects.filter(pk=blob.pk).update(ref_count=0)
+        delete_files = models.ImageBlobManager._delete_files
+
+        def reacquire(manager, digest, name):
+            models.ImageBlob.objects.acquire(content)
+            return delete_files(manager, digest, name)
+
+        with patch.object(models.ImageBlobManager, '_delete_files', reacquire):
+            models.ImageBlob.objects.collect(blob.name)
+
+        self.assertEqual(models.ImageBlob.objects.get(pk=blob.pk).ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.name))
+        default_storage.delete(blob.name)
+
+    def test_image_blob_collect_keeps_files_when_delete_fails(self):
+        """Test files are only deleted once the blob row is gone"""
+        blob = models.ImageBlob.objects.acquire(ContentFile(b'image bytes', name='photo.jpg'))
+        models.ImageBlob.objects.filter(pk=blob.pk).update(ref_count=0)
+
+        with patch.object(models.ImageBlob, 'delete', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                models.ImageBlob.objects.collect(blob.name)
+
+        self.assertTrue(default_storage.exists(blob.name))
+        default_storage.delete(blob.name)
+
+    def test_image_blob_multi_picture_jpeg_extension(self):
+        """Test multi picture JPEGs are stored with a .jpg extension"""
+        content = ContentFile(b'image bytes', name='photo.mpo')
+        content.image = SimpleNamespace(format='MPO')
+
+        blob = models.ImageBlob.objects.acquire(content)
+
+        self.assertTrue(blob.name.endswith('.jpg'))
+        default_storage.delete(blob.name)
+
+    def test_image_blob_acquire_and_release(self):
+        """Test identical image content is stored once and collected"""
+        content = ContentFile(b'image bytes', name='photo.JPG')
+        digest = hashlib.sha256(b'image bytes').hexdigest()
+
+        blob = models.ImageBlob.objects.acquire(content)
+        with patch('core.models.default_storage.save') as save:
+            again = models.ImageBlob.objects.acquire(content)
+
+        self.assertEqual(blob.name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(again.pk, blob.pk)
+        save.assert_not_called()
+        self.assertTrue(default_storage.exists(blob.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.ImageBlob.objects.release(blob.name)
+        self.assertTrue(default_storage.exists(blob.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            models.ImageBlob.objects.release(blob.name)
+
+        self.assertFalse(models.ImageBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.name))
@@ -0,0 +1,62 @@
+"""
+Tests for the estimated count paginator
+"""
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from core import models
+from core.pagination import EstimatedCountPaginator
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            "test@example.com",
+            "testing321")
+        models.Tag.objects.bulk_create(
+            models.Tag(user=self.user, name=f'tag{i}') for i in range(12)
+        )
+        self.queryset = models.Tag.objects.order_by('id')
+
+    def test_small_result_counted_exactly(self):
+        """Test results under the threshold get an exact count"""
+        paginator = EstimatedCountPaginator(self.queryset, 5)
+
+        self.assertEqual(paginator.count, 12)
+        self.assertTrue(paginator.count_is_exact)
+        self.assertEqual(paginator.num_pages, 3)
+
+    @patch('core.pagination.planner_row_estimate', return_value=None)
+    @patch.object(EstimatedCountPaginator, 'count_limit', 8)
+    @patch.object(EstimatedCountPaginator, 'exact_count_threshold', 4)
+    def test_large_result_capped_without_planner(self, patched_estimate):
+        """Test results past the limit are capped when no estimate exists"""
+        paginator = EstimatedCountPaginator(self.queryset, 5)
+
+        self.assertEqual(paginator.count, 8)
+        self.assertFalse(paginator.count_is_exact)
+
+    @patch('core.pagination.planner_row_estimate', return_value=6)
+    @patch.object(EstimatedCountPaginator, 'exact_count_threshold', 4)
+    def test_large_result_uses_planner_estimate(self, patched_estimate):
+        """Test results past the threshold use the planner estimate"""
+        paginator = EstimatedCountPaginator(self.queryset, 5)
+
+        self.assertEqual(paginator.count, 6)
+        self.assertFalse(paginator.count_is_exact)
+        patched_estimate.assert_called_once()
+
+    @patch('core.pagination.planner_row_estimate', return_value=6)
+    @patch.object(EstimatedCountPaginator, 'exact_count_threshold', 4)
+    def test_pages_past_low_estimate(self, patched_estimate):
+        """Test pages past an underestimated total are still reachable"""
+        paginator = EstimatedCountPaginator(self.queryset, 5)
+
+        page = paginator.page(2)
+        self.assertEqual(len(page.object_list), 5)
+        self.assertTrue(page.has_next())
+        last_page = paginator.page(3)
+        self.assertEqual(len(last_page.object_list), 2)
+        self.assertFalse(last_page.has_next())
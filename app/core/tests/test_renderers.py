@@ -0,0 +1,204 @@
+"""
+Tests for the orjson renderer and parser
+"""
+import datetime
+import io
+import json
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from core.parsers import ORJSONParser
+from core.renderers import (
+    ColumnarJSONRenderer,
+    MessagePackRenderer,
+    ORJSONRenderer,
+    msgpack,
+    to_columnar,
+)
+
+
+PAYLOAD = {
+    'price': Decimal('5.25'),
+    'aware': datetime.datetime(2022, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+    'naive': datetime.datetime(2022, 5, 1, 12, 30),
+    'date': datetime.date(2022, 5, 1),
+    'time': datetime.time(8, 15, 30, 250),
+    'duration': datetime.timedelta(minutes=90),
+    'image': f'http://testserver/media/{uuid.UUID(int=7)}.jpg',
+    'uuid': uuid.UUID(int=7),
+    'text': 'Café \u2028\u2029 \U0001f373 "quoted"\n\x01',
+    'lazy': gettext_lazy('Not found.'),
+    'errors': ReturnDict({'title': [ErrorDetail('Required.', code='required')]}, serializer=None),
+    'nested': [{'id': 1, 'ok': True, 'none': None, 'rate': 0.1}],
+    'floats': [1e16, 1e-7, 2.5, 123456789.125],
+}
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def test_matches_json_renderer(self):
+        """Test output decodes to what JSONRenderer sends"""
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(PAYLOAD)),
+            json.loads(JSONRenderer().render(PAYLOAD)),
+        )
+
+    def test_matches_json_renderer_without_floats(self):
+        """Test output is byte for byte the one of JSONRenderer but for floats"""
+        data = {key: value for key, value in PAYLOAD.items() if key != 'floats'}
+
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_float_exponents(self):
+        """Test float exponents are spelled the orjson way"""
+        self.assertEqual(ORJSONRenderer().render([1e16, 1e-7]), b'[1e16,1e-7]')
+
+    def test_big_integers_fall_back(self):
+        """Test integers orjson cannot encode still render"""
+        data = {'id': 2 ** 70}
+
+        self.assertEqual(ORJSONRenderer().render(data), b'{"id":1180591620717411303424}')
+
+    def test_indent_falls_back(self):
+        """Test indented output is rendered like JSONRenderer"""
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            ORJSONRenderer().render(PAYLOAD, media_type),
+            JSONRenderer().render(PAYLOAD, media_type),
+        )
+
+    def test_without_orjson(self):
+        """Test rendering works when orjson is not installed"""
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(ORJSONRenderer().render(PAYLOAD), JSONRenderer().render(PAYLOAD))
+
+    def test_none_renders_empty(self):
+        """Test no data renders an empty body"""
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class ORJSONParserTests(SimpleTestCase):
+
+    def parse(self, parser, body, encoding='utf-8'):
+        return parser.parse(io.BytesIO(body), parser_context={'encoding': encoding})
+
+    def test_matches_json_parser(self):
+        """Test documents parse like with JSONParser"""
+        body = '{"title": "Café", "price": "5.25", "n": [1, 2.5, null, true]}'.encode()
+
+        self.assertEqual(self.parse(ORJSONParser(), body), self.parse(JSONParser(), body))
+
+    def test_big_integers_fall_back(self):
+        """Test integers orjson cannot decode still parse"""
+        self.assertEqual(self.parse(ORJSONParser(), b'{"id": 1180591620717411303424}'),
+                         {'id': 2 ** 70})
+
+    def test_other_encodings(self):
+        """Test bodies in other encodings are decoded"""
+        body = '{"title": "Café"}'.encode('latin-1')
+
+        self.assertEqual(self.parse(ORJSONParser(), body, 'latin-1'), {'title': 'Café'})
+
+    def test_invalid_json_errors_like_json_parser(self):
+        """Test invalid documents raise the JSONParser error"""
+        for body in (b'{"title": ', b'{"rate": NaN}'):
+            with self.subTest(body=body):
+                with self.assertRaises(ParseError) as expected:
+                    self.parse(JSONParser(), body)
+                with self.assertRaises(ParseError) as error:
+                    self.parse(ORJSONParser(), body)
+                self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_without_orjson(self):
+        """Test parsing works when orjson is not installed"""
+        with patch('core.parsers.orjson', None):
+            self.assertEqual(self.parse(ORJSONParser(), b'{"id": 1}'), {'id': 1})
+
+
+class ColumnarJSONRendererTests(SimpleTestCase):
+
+    def test_to_columnar_deduplicates_related(self):
+        """Test nested objects become ids into a side table"""
+        vegan = {'id': 3, 'name': 'Vegan'}
+        rows = [
+            {'id': 1, 'title': 'A', 'tags': [vegan, {'id': 5, 'name': 'Quick'}], 'ids': [7]},
+            {'id': 2, 'title': 'B', 'tags': [vegan], 'ids': []},
+        ]
+
+        self.assertEqual(to_columnar(rows), {
+            'columns': ['id', 'title', 'tags', 'ids'],
+            'rows': [[1, 'A', [3, 5], [7]], [2, 'B', [3], []]],
+            'related': {
+                'tags': {
+                    'columns': ['id', 'name'],
+                    'rows': [[3, 'Vegan'], [5, 'Quick']],
+                    'related': {},
+                },
+            },
+        })
+
+    def test_to_columnar_differing_keys(self):
+        """Test objects with differing keys share one set of columns"""
+        rows = [{'status': 201}, {'errors': {}, 'status': 400}]
+
+        self.assertEqual(to_columnar(rows), {
+            'columns': ['status', 'errors'],
+            'rows': [[201, None], [400, {}]],
+            'related': {},
+        })
+
+    def test_to_columnar_empty_list(self):
+        """Test an empty list still renders as columnar"""
+        self.assertEqual(to_columnar([]), {'columns': [], 'rows': [], 'related': {}})
+
+    def test_to_columnar_leaves_non_object_lists(self):
+        """Test lists of values that are not objects are left alone"""
+        rows = ['a', 'b']
+
+        self.assertIs(to_columnar(rows), rows)
+
+    def test_render_paginated_results(self):
+        """Test only the results of a paginated response are columnar"""
+        data = {'next': None, 'results': [{'id': 1}]}
+
+        self.assertEqual(
+            ColumnarJSONRenderer().render(data),
+            b'{"next":null,"results":{"columns":["id"],"rows":[[1]],"related":{}}}',
+        )
+
+    def test_render_empty_page(self):
+        """Test an empty page of results still renders as columnar"""
+        data = {'next': None, 'results': []}
+
+        self.assertEqual(
+            ColumnarJSONRenderer().render(data),
+            b'{"next":null,"results":{"columns":[],"rows":[],"related":{}}}',
+        )
+
+    def test_render_object_unchanged(self):
+        """Test non list responses render as plain JSON"""
+        data = {'id': 1, 'tags': [{'id': 3, 'name': 'Vegan'}]}
+
+        self.assertEqual(ColumnarJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class MessagePackRendererTests(SimpleTestCase):
+
+    def test_values_match_json(self):
+        """Test decoded values are those the JSON renderer sends"""
+        body = MessagePackRenderer().render(PAYLOAD)
+
+        self.assertEqual(
+            msgpack.unpackb(body),
+            ORJSONParser().parse(io.BytesIO(JSONRenderer().render(PAYLOAD))),
+        )
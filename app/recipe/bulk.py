@@ -0,0 +1,337 @@
+"""
+Bulk writes of recipes
+"""
+import json
+
+from django.db import connections, router, transaction
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+
+from core.models import ContentVersion, Ingredient, Recipe, Tag
+from recipe.serializers import RecipeDetailSerializer, RecipeImportSerializer
+from recipe.signals import invalidate_attr_lists, refresh_search_vectors
+
+# Rows per relation link INSERT, keeping the parameters below SQLite's limit.
+LINK_INSERT_BATCH_SIZE = 400
+
+# Recipe fields holding tag and ingredient names, with their models.
+RELATIONS = [('tags', Tag), ('ingredients', Ingredient)]
+
+
+def iter_ndjson(stream):
+    """Yield (line number, record or error) for each non-blank NDJSON line."""
+    if stream is None:
+        return
+    for number, line in enumerate(iter(stream.readline, b''), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, ValidationError({'non_field_errors': [f'Invalid JSON: {exc}']})
+
+
+def insert_links(field_name, rows):
+    """Insert (recipe id, attribute id) rows of a relation.
+
+    Links are plain id pairs, so they are written with multi-row INSERT
+    statements instead of building a model instance per row as
+    ``bulk_create`` would.
+    """
+    field = Recipe._meta.get_field(field_name)
+    through = field.remote_field.through
+    connection = connections[router.db_for_write(through)]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}, {}) VALUES '.format(
+        quote(through._meta.db_table),
+        quote(field.m2m_column_name()),
+        quote(field.m2m_reverse_name()),
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), LINK_INSERT_BATCH_SIZE):
+            chunk = rows[start:start + LINK_INSERT_BATCH_SIZE]
+            cursor.execute(
+                sql + ', '.join(['(%s, %s)'] * len(chunk)),
+                [value for row in chunk for value in row],
+            )
+
+
+def resolve_names(user, model, names_by_recipe):
+    """Return recipe ids mapped to the distinct attribute ids of their names."""
+    ids = model.objects.get_or_create_many(
+        user, (name for names in names_by_recipe.values() for name in names)
+    )
+    return {
+        recipe_id: list(dict.fromkeys(ids[name] for name in names))
+        for recipe_id, names in names_by_recipe.items()
+    }
+
+
+def create_recipes(user, records):
+    """Insert validated recipe records with a fixed number of queries."""
+    names = {field_name: [] for field_name, _ in RELATIONS}
+    for data in records:
+        for field_name, _ in RELATIONS:
+            names[field_name].append(data.pop(field_name, []))
+
+    recipes = Recipe.objects.bulk_create([Recipe(user=user, **data) for data in records])
+    for field_name, model in RELATIONS:
+        attr_ids = resolve_names(user, model, {
+            recipe.id: recipe_names
+            for recipe, recipe_names in zip(recipes, names[field_name])
+        })
+        insert_links(field_name, [
+            (recipe_id, attr_id)
+            for recipe_id, ids in attr_ids.items()
+            for attr_id in ids
+        ])
+    return recipes
+
+
+def replace_links(user, field_name, model, names_by_recipe):
+    """Make the relation links of recipes match the given names."""
+    desired = resolve_names(user, model, names_by_recipe)
+    through = Recipe._meta.get_field(field_name).remote_field.through
+    target = Recipe._meta.get_field(field_name).m2m_reverse_name()
+
+    stale = []
+    current = set()
+    links = through.objects.filter(recipe_id__in=desired)
+    for link_id, recipe_id, attr_id in links.values_list('id', 'recipe_id', target):
+        if attr_id in desired[recipe_id]:
+            current.add((recipe_id, attr_id))
+        else:
+            stale.append(link_id)
+    through.objects.filter(id__in=stale).delete()
+    insert_links(field_name, [
+        (recipe_id, attr_id)
+        for recipe_id, ids in desired.items()
+        for attr_id in ids
+        if (recipe_id, attr_id) not in current
+    ])
+
+
+def after_bulk_write(user, recipe_ids):
+    """Do what model signals do for single writes, once for many recipes."""
+    ContentVersion.objects.bump(user.id)
+    invalidate_attr_lists(user.id, Tag, Ingredient)
+    refresh_search_vectors(recipe_ids)
+
+
+class RecipeImporter:
+    """Validate and insert recipes in batches for one user.
+
+    Every batch resolves its tag and ingredient names with one lookup per
+    model, inserts recipes and relation links in bulk and commits on its
+    own. Invalid records are reported by line and skipped. Since bulk
+    inserts send no model signals, the content version, cached attribute
+    lists and search vectors are refreshed per batch explicitly.
+    """
+
+    def __init__(self, user, batch_size=1000, max_errors=1000):
+        self.user = user
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        # One serializer validates every record, so its fields are only
+        # built once.
+        self.validator = RecipeImportSerializer()
+
+    def run(self, records):
+        """Import (line number, record) pairs and return a summary."""
+        batch = []
+        for number, record in records:
+            validated = self._validate(number, record)
+            if validated is not None:
+                batch.append(validated)
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+    def _validate(self, number, record):
+        try:
+            if isinstance(record, ValidationError):
+                raise record
+            if not isinstance(record, dict):
+                raise ValidationError({'non_field_errors': ['Expected a JSON object.']})
+            return self.validator.run_validation(record)
+        except ValidationError as exc:
+            self.failed += 1
+            if len(self.errors) < self.max_errors:
+                self.errors.append({'line': number, 'errors': exc.detail})
+            return None
+
+    def _write(self, batch):
+        """Insert one batch of validated recipes in its own transaction."""
+        with transaction.atomic():
+            recipes = create_recipes(self.user, batch)
+            after_bulk_write(self.user, [recipe.id for recipe in recipes])
+        self.created += len(recipes)
+
+
+def is_recipe_id(value):
+    """Whether a decoded JSON value is an integer id, rejecting booleans."""
+    # bool subclasses int and True == 1, so isinstance() would accept true.
+    return type(value) is int
+
+
+class RecipeBulkOperations:
+    """Create, partially update or delete many recipes of one user.
+
+    Each operation takes a list payload, runs a fixed number of set-based
+    queries inside one transaction and returns one result per item, in
+    order: its HTTP status and either the recipe or the errors. Invalid
+    items are skipped without affecting the others.
+    """
+
+    def __init__(self, user, context=None):
+        self.user = user
+        self.context = context or {}
+
+    def create(self, items):
+        """Create recipes from a list of recipe objects."""
+        results = [None] * len(items)
+        validator = RecipeImportSerializer()
+        valid = {}
+        for position, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValidationError({'non_field_errors': ['Expected an object.']})
+                valid[position] = validator.run_validation(item)
+            except ValidationError as exc:
+                results[position] = self._error(status.HTTP_400_BAD_REQUEST, exc.detail)
+
+        with transaction.atomic():
+            recipes = create_recipes(self.user, list(valid.values()))
+            recipe_ids = [recipe.id for recipe in recipes]
+            if recipe_ids:
+                after_bulk_write(self.user, recipe_ids)
+
+        self._fill(results, dict(zip(valid, recipe_ids)), status.HTTP_201_CREATED)
+        return results
+
+    def partial_update(self, items):
+        """Update the given fields of recipes identified by their ids."""
+        results = [None] * len(items)
+        with transaction.atomic():
+            instances = self._lock(item.get('id') for item in items if isinstance(item, dict))
+            updates = {}
+            for position, item in enumerate(items):
+                instance, errors = self._target(item, instances, updates.values())
+                if errors is None:
+                    serializer = RecipeImportSerializer(instance, data=item, partial=True)
+                    if serializer.is_valid():
+                        updates[position] = (instance, serializer.validated_data)
+                        continue
+                    errors = self._error(status.HTTP_400_BAD_REQUEST, serializer.errors)
+                results[position] = errors
+
+            fields = set()
+            relations = {field_name: {} for field_name, _ in RELATIONS}
+            for instance, data in updates.values():
+                for field_name, value in data.items():
+                    if field_name in relations:
+                        relations[field_name][instance.id] = value
+                    else:
+                        setattr(instance, field_name, value)
+                        fields.add(field_name)
+            if fields:
+                Recipe.objects.bulk_update(
+                    [instance for instance, _ in updates.values()], sorted(fields)
+                )
+            for field_name, model in RELATIONS:
+                if relations[field_name]:
+                    replace_links(self.user, field_name, model, relations[field_name])
+            if updates:
+                after_bulk_write(
+                    self.user, [instance.id for instance, _ in updates.values()]
+                )
+
+        self._fill(
+            results,
+            {position: instance.id for position, (instance, _) in updates.items()},
+            status.HTTP_200_OK,
+        )
+        return results
+
+    def destroy(self, items):
+        """Delete recipes given as ids or objects with an id."""
+        results = [None] * len(items)
+        ids = [item.get('id') if isinstance(item, dict) else item for item in items]
+        with transaction.atomic():
+            existing = set(
+                self._queryset(ids).select_for_update().values_list('id', flat=True)
+            )
+            deleted = set()
+            for position, recipe_id in enumerate(ids):
+                if (
+                    is_recipe_id(recipe_id)
+                    and recipe_id in existing
+                    and recipe_id not in deleted
+                ):
+                    deleted.add(recipe_id)
+                    results[position] = {'id': recipe_id, 'status': status.HTTP_204_NO_CONTENT}
+                else:
+                    results[position] = self._error(
+                        status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'}
+                    )
+
+            if deleted:
+                # Links go with one statement per relation; the recipe delete
+                # then runs the usual signals, which release image blobs,
+                # bump the content version and invalidate attribute lists.
+                for field_name, _ in RELATIONS:
+                    Recipe._meta.get_field(field_name).remote_field.through.objects.filter(
+                        recipe_id__in=deleted
+                    ).delete()
+                Recipe.objects.filter(id__in=deleted).delete()
+        return results
+
+    def _queryset(self, ids):
+        ids = [recipe_id for recipe_id in ids if is_recipe_id(recipe_id)]
+        return Recipe.objects.filter(user=self.user, id__in=ids)
+
+    def _lock(self, ids):
+        """Return the user's recipes with the given ids, locked for update."""
+        return {
+            recipe.id: recipe
+            for recipe in self._queryset(list(ids)).select_for_update().defer('search_vector')
+        }
+
+    def _target(self, item, instances, updates):
+        """Return the recipe an update item targets, or its error result."""
+        if not isinstance(item, dict):
+            return None, self._error(
+                status.HTTP_400_BAD_REQUEST, {'non_field_errors': ['Expected an object.']}
+            )
+        recipe_id = item.get('id')
+        if not is_recipe_id(recipe_id):
+            return None, self._error(
+                status.HTTP_400_BAD_REQUEST, {'id': ['A valid integer is required.']}
+            )
+        instance = instances.get(recipe_id)
+        if instance is None:
+            return None, self._error(status.HTTP_404_NOT_FOUND, {'detail': 'Not found.'})
+        if any(instance is updated for updated, _ in updates):
+            return None, self._error(
+                status.HTTP_400_BAD_REQUEST, {'id': ['Duplicate recipe id.']}
+            )
+        return instance, None
+
+    def _error(self, status_code, errors):
+        return {'status': status_code, 'errors': errors}
+
+    def _fill(self, results, recipe_ids, status_code):
+        """Fill in serialized recipes for positions that succeeded."""
+        recipes = Recipe.objects.filter(id__in=recipe_ids.values()).defer(
+            'search_vector'
+        ).prefetch_related('tags', 'ingredients').in_bulk()
+        for position, recipe_id in recipe_ids.items():
+            data = RecipeDetailSerializer(recipes[recipe_id], context=self.context).data
+            results[position] = {'status': status_code, 'data': data}
@@ -0,0 +1,89 @@
+"""
+Response cache for recipe attribute lists
+"""
+import hashlib
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class AttrListCache:
+    """Cache of serialized tag and ingredient lists per user and query.
+
+    Every key embeds a generation token stored per (model, user) in the
+    same cache. Invalidating replaces the token, which orphans all entries
+    of that user for that model at once; they then age out of the backend.
+    Works with any Django cache backend. With the local-memory backend each
+    process invalidates only its own entries, so multi-process deployments
+    should point ``RECIPE_ATTR_CACHE_ALIAS`` at a shared backend such as
+    the file-based one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'RECIPE_ATTR_CACHE_ALIAS', 'default')]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RECIPE_ATTR_CACHE_TIMEOUT', 300)
+
+    def _generation(self, model_name, user_id):
+        key = f'recipe-attrs:gen:{model_name}:{user_id}'
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, uuid.uuid4().hex, None)
+            generation = self.cache.get(key)
+        return generation
+
+    def make_key(self, model_name, user_id, variant):
+        """Return the cache key for one query of a user's list."""
+        generation = self._generation(model_name, user_id)
+        digest = hashlib.sha256(variant.encode()).hexdigest()[:32]
+        return f'recipe-attrs:{model_name}:{user_id}:{generation}:{digest}'
+
+    def get(self, key):
+        """Return cached list data, or None."""
+        data = self.cache.get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return data
+
+    def set(self, key, data):
+        """Store list data."""
+        self.cache.set(key, data, self.timeout)
+
+    def invalidate(self, model_name, user_id):
+        """Drop every cached list of a model for a user."""
+        self.cache.set(f'recipe-attrs:gen:{model_name}:{user_id}', uuid.uuid4().hex, None)
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self):
+        """Return the counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+    def reset_stats(self):
+        """Reset the counters."""
+        with self._lock:
+            self.hits = self.misses = self.invalidations = 0
+
+
+attr_list_cache = AttrListCache()
@@ -0,0 +1,67 @@
+"""
+Streaming export of recipes
+"""
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipe.rows import RecipeRowSerializer
+from recipe.serializers import RecipeDetailSerializer
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'recipes.ndjson'),
+    'csv': ('text/csv', 'recipes.csv'),
+}
+
+CSV_FIELDS = [
+    'id', 'title', 'description', 'time_in_minutes', 'price', 'link',
+    'tags', 'ingredients',
+]
+
+
+def iter_recipes(queryset, chunk_size):
+    """Yield serialized recipes, reading them in chunks.
+
+    Rows are fetched through ``iterator()``, a server-side cursor on
+    PostgreSQL, and tags and ingredients are read once per chunk, so
+    memory use does not grow with the number of recipes.
+    """
+    rows = RecipeRowSerializer(RecipeDetailSerializer.Meta.fields)
+    chunk = []
+    for row in rows.values(queryset).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from rows.serialize(chunk)
+            chunk = []
+    if chunk:
+        yield from rows.serialize(chunk)
+
+
+def ndjson_lines(recipes):
+    """Yield one JSON document per recipe."""
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for recipe in recipes:
+        yield encoder.encode(recipe) + '\n'
+
+
+class _Echo:
+    """File-like object returning what is written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(recipes):
+    """Yield a header and one CSV row per recipe.
+
+    Tag and ingredient names are joined with semicolons.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for recipe in recipes:
+        row = dict(recipe)
+        row['tags'] = ';'.join(tag['name'] for tag in recipe['tags'])
+        row['ingredients'] = ';'.join(
+            ingredient['name'] for ingredient in recipe['ingredients']
+        )
+        yield writer.writerow([row[field] for field in CSV_FIELDS])
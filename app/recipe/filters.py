@@ -0,0 +1,34 @@
+"""
+Query filters for recipe APIs
+"""
+from django.db.models import Count, Exists, OuterRef
+
+from core.models import Recipe
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+def filter_by_related(queryset, field_name, ids, match=MATCH_ANY):
+    """Filter recipes linked to any or all of the given related ids.
+
+    Both modes run as semi-joins against the through table, so recipes are
+    never multiplied by their links and no DISTINCT is needed. ``all``
+    groups the matching links per recipe and keeps recipes that have one
+    for every requested id.
+    """
+    field = Recipe._meta.get_field(field_name)
+    target = f'{field.m2m_reverse_field_name()}_id'
+    ids = set(ids)
+    links = field.remote_field.through.objects.filter(**{f'{target}__in': ids})
+
+    if match == MATCH_ALL:
+        matching = (
+            links.values('recipe_id')
+            .annotate(matched=Count(target))
+            .filter(matched=len(ids))
+            .values('recipe_id')
+        )
+        return queryset.filter(pk__in=matching)
+
+    return queryset.filter(Exists(links.filter(recipe_id=OuterRef('pk'))))
@@ -0,0 +1,150 @@
+"""
+On-disk cache of recipe images resized on demand
+"""
+import contextlib
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from recipe.images import FORMATS, render_width
+
+
+def _open_fd(path):
+    """Open a file for reading as a file named by its descriptor.
+
+    Nothing reading it can look the path up again, so the file stays
+    usable once it is removed.
+    """
+    return os.fdopen(os.open(path, os.O_RDONLY), 'rb')
+
+
+class ResizedImageCache:
+    """Size-bounded LRU cache of resized images under ``MEDIA_ROOT``.
+
+    Files are keyed by the stored image name, width and format. A hit
+    opens the file and touches its mtime, which is the recency the eviction
+    sorts by, without decoding the image. Misses render through Pillow and
+    write the file atomically. Either way the file is returned already
+    open, so an eviction in between cannot pull it from under the caller.
+
+    Each process tracks an estimate of the cache size from its last scan
+    plus the files it wrote since. The directory is only scanned when that
+    estimate passes ``RECIPE_IMAGE_CACHE_MAX_BYTES``, or once per
+    ``rescan_interval`` seconds to pick up other processes' writes, and
+    eviction then removes the least recently used files down to
+    ``low_water`` of the limit. Worker processes share the directory, so
+    eviction tolerates files removed by another process and leaves their
+    in-progress temporary files alone.
+    """
+    low_water = 0.9
+    rescan_interval = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estimated_bytes = None
+        self._scanned_at = 0.0
+
+    @property
+    def root(self):
+        return os.path.join(settings.MEDIA_ROOT, settings.RECIPE_IMAGE_CACHE_DIR)
+
+    @property
+    def max_bytes(self):
+        return settings.RECIPE_IMAGE_CACHE_MAX_BYTES
+
+    def bucket(self, width):
+        """Return the configured width to serve for a requested width."""
+        widths = sorted(settings.RECIPE_IMAGE_WIDTHS)
+        for bucket in widths:
+            if bucket >= width:
+                return bucket
+        return widths[-1]
+
+    def path(self, name, width, fmt):
+        """Return the cache file path of an image at a width and format."""
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return os.path.join(
+            self.root, digest[:2], f'{digest}_{width}{FORMATS[fmt][1]}'
+        )
+
+    def open(self, source, name, width, fmt):
+        """Return the resized image opened for reading, rendering it on a miss."""
+        path = self.path(name, width, fmt)
+        try:
+            file = _open_fd(path)
+        except FileNotFoundError:
+            pass
+        else:
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(path)
+            return file
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        file = None
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                render_width(source, tmp_file, width, fmt)
+                size = tmp_file.tell()
+            # Opened before it is published, so it stays readable if evicted.
+            file = _open_fd(tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if file is not None:
+                file.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp_path)
+            raise
+        self._added(size, keep=path)
+        return file
+
+    def _added(self, size, keep):
+        """Account for a written file, evicting when a scan is due."""
+        with self._lock:
+            if self._estimated_bytes is not None:
+                self._estimated_bytes += size
+            due = (
+                self._estimated_bytes is None
+                or self._estimated_bytes > self.max_bytes
+                or time.monotonic() - self._scanned_at > self.rescan_interval
+            )
+        if due:
+            self.evict(keep=keep)
+
+    def evict(self, keep=None):
+        """Remove least recently used files once the cache is past its size."""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total > self.max_bytes:
+            target = self.max_bytes * self.low_water
+            entries.sort()
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                if path == keep:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+                total -= size
+
+        with self._lock:
+            self._estimated_bytes = total
+            self._scanned_at = time.monotonic()
+
+
+resized_image_cache = ResizedImageCache()
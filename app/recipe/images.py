@@ -0,0 +1,76 @@
+"""
+Image variants for recipe uploads.
+
+This module only depends on Pillow so it can run in worker processes
+that never set up Django.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+VARIANTS = {
+    'thumbnail': {'size': (200, 200), 'format': 'JPEG', 'ext': '.jpg'},
+    'medium': {'size': (800, 800), 'format': 'JPEG', 'ext': '.jpg'},
+    'webp': {'size': (1600, 1600), 'format': 'WEBP', 'ext': '.webp'},
+}
+
+# Output formats of resized images: Pillow format, extension, media type.
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+    'webp': ('WEBP', '.webp', 'image/webp'),
+    'png': ('PNG', '.png', 'image/png'),
+}
+
+# EXIF orientations that swap width and height once applied.
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def variant_name(name, variant):
+    """Return the file name of a variant stored next to the original."""
+    stem = os.path.splitext(name)[0]
+    return f'{stem}_{variant}{VARIANTS[variant]["ext"]}'
+
+
+def render_variants(path):
+    """Write every variant of the image at path and return their paths.
+
+    Variants are resized from the largest to the smallest, each from the
+    previous one, so only the first resize touches the full image.
+    """
+    ordered = sorted(VARIANTS, key=lambda variant: VARIANTS[variant]['size'], reverse=True)
+    paths = {}
+    with Image.open(path) as image:
+        # thumbnail() on the unloaded image lets JPEG decode at a reduced
+        # scale instead of decoding every pixel.
+        image.thumbnail(VARIANTS[ordered[0]]['size'])
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+
+        for variant in ordered:
+            spec = VARIANTS[variant]
+            image.thumbnail(spec['size'])
+            resized = image
+            if spec['format'] == 'JPEG' and image.mode != 'RGB':
+                resized = image.convert('RGB')
+            variant_path = variant_name(path, variant)
+            resized.save(variant_path, format=spec['format'], quality=85)
+            paths[variant] = variant_path
+    return paths
+
+
+def render_width(path, dest, width, fmt):
+    """Write the image at path to dest, at most width pixels wide."""
+    pil_format = FORMATS[fmt][0]
+    with Image.open(path) as image:
+        if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            box = (image.width, width)
+        else:
+            box = (width, image.height)
+        image.thumbnail(box)
+        image = ImageOps.exif_transpose(image)
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        image.save(dest, format=pil_format, quality=85)
@@ -0,0 +1,90 @@
+"""
+Mixins for recipe APIs
+"""
+import hashlib
+
+from django.utils.cache import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import ContentVersion
+
+
+class ConditionalGetMixin:
+    """Serve strong ETags and 304 responses for read actions.
+
+    The ETag combines the user's content version, which every write to
+    their recipes, tags and ingredients bumps, with the request path and
+    negotiated media type. A matching If-None-Match costs one query and
+    skips the queryset and serialization entirely.
+    """
+
+    def get_etag(self, request):
+        """Return the ETag for the current state of the user's data."""
+        version = ContentVersion.objects.current(request.user.pk)
+        variant = f'{request.get_full_path()}|{request.accepted_media_type}'
+        digest = hashlib.sha256(variant.encode()).hexdigest()[:16]
+        return f'"{request.user.pk}-{version}-{digest}"'
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        """Run a read handler unless the client already has this version."""
+        etag = self.get_etag(request)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in if_none_match and (self.lookup_url_kwarg or self.lookup_field) in kwargs:
+            # "*" only matches an existing representation, so check the
+            # object exists, raising a 404 otherwise.
+            self.get_object()
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+
+class CachedListMixin:
+    """Serve list responses from a per-user cache.
+
+    ``list_cache`` takes an object with the ``make_key``/``get``/``set``
+    interface of ``recipe.cache.AttrListCache``; None disables caching.
+    """
+    list_cache = None
+
+    def list(self, request, *args, **kwargs):
+        if self.list_cache is None:
+            return super().list(request, *args, **kwargs)
+
+        key = self.list_cache.make_key(
+            self.queryset.model._meta.model_name,
+            request.user.pk,
+            f'{request.get_full_path()}|{request.accepted_media_type}',
+        )
+        data = self.list_cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.list_cache.set(key, response.data)
+        return response
+
+
+class RowListMixin:
+    """Render list responses from ``values()`` rows instead of instances.
+
+    ``get_row_serializer()`` returns an object with the ``values``/``serialize``
+    interface of ``recipe.rows.RecipeRowSerializer``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        rows = self.get_row_serializer()
+        queryset = rows.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.serialize(page))
+        return Response(rows.serialize(queryset))
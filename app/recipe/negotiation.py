@@ -0,0 +1,15 @@
+"""
+Content negotiation for recipe APIs
+"""
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FileContentNegotiation(DefaultContentNegotiation):
+    """Negotiation for views returning files instead of serialized data.
+
+    The file's media type does not depend on the Accept header, so any
+    header is accepted and errors render with the first renderer.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
@@ -0,0 +1,65 @@
+"""
+Pagination for recipe APIs
+"""
+from collections import OrderedDict
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from core.pagination import EstimatedCountPaginator
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Opt-in keyset pagination over recipe ids.
+
+    Responses stay unpaginated unless the client sends a cursor or a page
+    size, so existing clients keep receiving a plain list.
+    """
+    ordering = 'id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (self.cursor_query_param not in params
+                and self.page_size_query_param not in params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """Opt-in page number pagination with an estimated total for big results.
+
+    Responses stay unpaginated unless the client sends a page or a page
+    size. Paginated responses carry ``count_is_exact`` next to ``count``.
+    """
+    django_paginator_class = EstimatedCountPaginator
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if (self.page_query_param not in params
+                and self.page_size_query_param not in params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        paginator = self.page.paginator
+        return Response(OrderedDict([
+            ('count', paginator.count),
+            ('count_is_exact', paginator.count_is_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_exact'] = {
+            'type': 'boolean',
+            'example': True,
+        }
+        return response_schema
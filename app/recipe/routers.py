@@ -0,0 +1,20 @@
+"""
+Routers for recipe APIs
+"""
+from rest_framework.routers import DefaultRouter, Route
+
+
+class BulkRouter(DefaultRouter):
+    """Router also mapping PATCH and DELETE on collection URLs.
+
+    They route to ``bulk_partial_update`` and ``bulk_destroy``, which are
+    only bound for viewsets that define them.
+    """
+    routes = [
+        route._replace(mapping={
+            **route.mapping,
+            'patch': 'bulk_partial_update',
+            'delete': 'bulk_destroy',
+        }) if isinstance(route, Route) and route.mapping.get('get') == 'list' else route
+        for route in DefaultRouter.routes
+    ]
@@ -0,0 +1,108 @@
+"""
+Read-only rendering of recipes from values() rows
+"""
+from collections import defaultdict
+
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from core.models import Recipe
+from recipe.serializers import RecipeDetailSerializer
+
+RELATIONS = ('tags', 'ingredients')
+
+
+def _decimal_representation(field):
+    """Return a to_representation for a DecimalField skipping the quantize."""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize:
+        return field.to_representation
+    exponent = -field.decimal_places
+
+    def to_representation(value):
+        # Database values already carry the column's decimal places.
+        if value.as_tuple().exponent == exponent:
+            return '{:f}'.format(value)
+        return field.to_representation(value)
+
+    return to_representation
+
+
+class RecipeRowSerializer:
+    """Render recipes from ``values()`` rows like the recipe serializers.
+
+    Plain dicts are built straight from the rows, skipping model instances
+    and per field serializer machinery, and tags and ingredients are read
+    from their through tables in one query each. Output matches
+    ``RecipeDetailSerializer`` restricted to ``fields`` with ``expand``
+    handled the same way, given relations prefetched in id order.
+    """
+    serializer_class = RecipeDetailSerializer
+
+    def __init__(self, fields, expand=None):
+        template = self.serializer_class()
+        # Keep the serializer's field order whatever order was requested.
+        self.fields = [name for name in template.fields if name in fields]
+        self.expand = expand
+        self.columns = ['id'] + [
+            name for name in self.fields if name not in RELATIONS and name != 'id'
+        ]
+        self.representations = {}
+        self.related_fields = {}
+        for name in self.fields:
+            field = template.fields[name]
+            if name in RELATIONS:
+                self.related_fields[name] = field.child.Meta.fields
+            elif isinstance(field, serializers.DecimalField):
+                self.representations[name] = _decimal_representation(field)
+            elif not isinstance(field, (serializers.CharField, serializers.IntegerField)):
+                self.representations[name] = field.to_representation
+
+    def values(self, queryset):
+        """Return the rows to render for a recipe queryset."""
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def serialize(self, rows):
+        """Return a list of dicts for the given rows."""
+        rows = list(rows)
+        ids = [row['id'] for row in rows]
+        related = {name: self._related(name, ids) for name in self.related_fields}
+        representations = self.representations
+
+        data = []
+        for row in rows:
+            item = {}
+            for name in self.fields:
+                if name in related:
+                    item[name] = related[name].get(row['id'], [])
+                    continue
+                value = row[name]
+                if value is not None and name in representations:
+                    value = representations[name](value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    def _related(self, name, ids):
+        """Return related objects, or their ids, grouped by recipe id."""
+        grouped = defaultdict(list)
+        if not ids:
+            return grouped
+
+        field = Recipe._meta.get_field(name)
+        source = f'{field.m2m_field_name()}_id'
+        target = field.m2m_reverse_field_name()
+        links = field.remote_field.through.objects.filter(
+            **{f'{source}__in': ids}
+        ).order_by(f'{target}_id')
+
+        if self.expand is not None and name not in self.expand:
+            for recipe_id, pk in links.values_list(source, f'{target}_id'):
+                grouped[recipe_id].append(pk)
+            return grouped
+
+        child_fields = self.related_fields[name]
+        lookups = [f'{target}__{child}' for child in child_fields]
+        for recipe_id, *values in links.values_list(source, *lookups):
+            grouped[recipe_id].append(dict(zip(child_fields, values)))
+        return grouped
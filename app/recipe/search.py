@@ -0,0 +1,89 @@
+"""
+Full-text search for recipes
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import (Case,
+                              Exists,
+                              F,
+                              OuterRef,
+                              Q,
+                              Subquery,
+                              TextField,
+                              Value,
+                              When)
+
+from core.models import Ingredient, Recipe, Tag
+
+SEARCH_CONFIG = 'english'
+
+
+def supports_search_vectors(using='default'):
+    """Return whether the database maintains stored search vectors."""
+    return connections[using].vendor == 'postgresql'
+
+
+def _names_subquery(field_name):
+    """Return a subquery joining the names linked to a recipe."""
+    field = Recipe._meta.get_field(field_name)
+    target = field.m2m_reverse_field_name()
+    names = (
+        field.remote_field.through.objects
+        .filter(recipe_id=OuterRef('pk'))
+        .values('recipe_id')
+        .annotate(names=StringAgg(f'{target}__name', ' '))
+        .values('names')
+    )
+    return Subquery(names, output_field=TextField())
+
+
+def search_vector_expression():
+    """Return the expression computing a recipe's stored search vector."""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(_names_subquery('tags'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(_names_subquery('ingredients'), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids):
+    """Recompute the stored search vectors of the given recipes.
+
+    ``recipe_ids`` may be a list or a values queryset of ids. Does nothing
+    on databases without search vector support.
+    """
+    if not supports_search_vectors():
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=search_vector_expression()
+    )
+
+
+def search_recipes(queryset, text):
+    """Filter recipes matching text and annotate them with a rank.
+
+    On PostgreSQL this matches the stored search vector. Elsewhere every
+    word must appear in the title, description, a tag or an ingredient,
+    and the rank counts words found in the title.
+    """
+    if supports_search_vectors(queryset.db):
+        query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        )
+
+    rank = Value(0.0)
+    for term in text.split():
+        queryset = queryset.filter(
+            Q(title__icontains=term)
+            | Q(description__icontains=term)
+            | Exists(Tag.objects.filter(recipe=OuterRef('pk'), name__icontains=term))
+            | Exists(Ingredient.objects.filter(recipe=OuterRef('pk'), name__icontains=term))
+        )
+        rank = rank + Case(
+            When(title__icontains=term, then=Value(1.0)),
+            default=Value(0.0),
+        )
+    return queryset.annotate(rank=rank)
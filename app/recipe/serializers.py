@@ -1,12 +1,63 @@
 """
 Serializers for recipe APIs
 """
+import copy
 
-from core.models import Ingredient, Recipe, Tag
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.urls import reverse
+from core.models import ImageBlob, Ingredient, Recipe, Tag
 from rest_framework import serializers
 
 
-class TagSerializer(serializers.ModelSerializer):
+class CachedFieldsModelSerializer(serializers.ModelSerializer):
+    """Model serializer that builds its fields once per class and process.
+
+    ``ModelSerializer.get_fields()`` introspects the model and rebuilds
+    every field on each instantiation. The first result is kept on the
+    class as a template and each instance gets copies of its unbound
+    fields, which binding then fills in.
+    """
+
+    def get_fields(self):
+        cls = type(self)
+        template = cls.__dict__.get('_fields_template')
+        if template is None:
+            template = super().get_fields()
+            cls._fields_template = template
+        return {name: self._copy_field(field) for name, field in template.items()}
+
+    @staticmethod
+    def _copy_field(field):
+        """Return an unbound copy of a template field."""
+        # Nested serializers and fields wrapping a child bind the child to
+        # themselves on creation, so they need a full copy.
+        if hasattr(field, 'child') or hasattr(field, 'child_relation'):
+            return copy.deepcopy(field)
+        return copy.copy(field)
+
+
+class RecipeAttrSerializer(CachedFieldsModelSerializer):
+    """Base serializer for per-user named recipe attributes"""
+
+    def validate_name(self, value):
+        """Reject renaming onto a name the user already has."""
+        if self.instance is not None:
+            model = type(self.instance)
+            duplicate = model.objects.filter(
+                user=self.instance.user, name=value
+            ).exclude(pk=self.instance.pk)
+            if duplicate.exists():
+                raise serializers.ValidationError(
+                    f'{model._meta.verbose_name.capitalize()} with this name already exists.'
+                )
+        return value
+
+
+class TagSerializer(RecipeAttrSerializer):
     """Serializer for tags"""
     class Meta:
         model = Tag
@@ -14,7 +65,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(RecipeAttrSerializer):
     """Serializer for ingredients"""
     class Meta:
         model = Ingredient
@@ -22,60 +73,75 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Serializer mixin that renders a requested subset of its fields.
+
+    ``fields`` names the fields to keep. Relations listed in
+    ``expandable_fields`` render nested when named in ``expand`` and as
+    lists of ids otherwise. Without ``expand`` they all render nested.
+    """
+    expandable_fields = ()
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None:
+            for name in self.expandable_fields:
+                if name in self.fields and name not in expand:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(
+                        many=True, read_only=True,
+                    )
+
+
+class RecipeSerializer(SparseFieldsMixin, CachedFieldsModelSerializer):
     """Serializer for recipes"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
+    expandable_fields = ('tags', 'ingredients')
 
     class Meta:
         model = Recipe
         fields = ['id', 'title', 'time_in_minutes', 'price', 'link', 'tags', 'ingredients']
         read_only_fields = ['id']
 
-    def _get_or_create_tags(self, tags, recipe):
-        """Handle getting or creating tags as needed."""
+    def _get_or_create_tags(self, tags):
+        """Return ids for the given tags, creating them as needed."""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            print(tag_obj)
-            print(created)
-            recipe.tags.add(tag_obj)
-
-    def _get_or_create_ingredients(self, ingredients, recipe):
-        """Handle getting or creating tags as needed."""
+        tag_ids = Tag.objects.get_or_create_many(
+            auth_user, (tag['name'] for tag in tags)
+        )
+        return tag_ids.values()
+
+    def _get_or_create_ingredients(self, ingredients):
+        """Return ids for the given ingredients, creating them as needed."""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+        ingredient_ids = Ingredient.objects.get_or_create_many(
+            auth_user, (ingredient['name'] for ingredient in ingredients)
+        )
+        return ingredient_ids.values()
 
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        recipe.tags.add(*self._get_or_create_tags(tags))
+        recipe.ingredients.add(*self._get_or_create_ingredients(ingredients))
 
         return recipe
 
     def update(self, instance, validated_data):
-        """Update recipe."""
+        """Update recipe, only touching relation links that changed."""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
 
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_tags(tags))
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            instance.ingredients.set(self._get_or_create_ingredients(ingredients))
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -91,11 +157,141 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description']
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
-    """Serializer for uploading images"""
+class AttrNameListField(serializers.Field):
+    """List of ``{"name": ...}`` objects validated into their names.
+
+    A flat alternative to a nested attribute serializer, for validating
+    large numbers of records. Names that passed validation are remembered,
+    since imports repeat the same few names across many records.
+    """
+    default_error_messages = {
+        'not_a_list': 'Expected a list of objects with a name.',
+    }
+
+    max_cached_names = 10000
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.name_field = serializers.CharField(max_length=255)
+        self._valid_names = {}
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            self.fail('not_a_list')
+        names = []
+        for item in data:
+            if not isinstance(item, dict) or 'name' not in item:
+                self.fail('not_a_list')
+            names.append(self._validate_name(item['name']))
+        return names
+
+    def _validate_name(self, value):
+        """Validate a name, remembering names that already passed."""
+        try:
+            return self._valid_names[value]
+        except (KeyError, TypeError):
+            pass
+        name = self.name_field.run_validation(value)
+        if isinstance(value, str) and len(self._valid_names) < self.max_cached_names:
+            self._valid_names[value] = name
+        return name
+
+    def to_representation(self, value):
+        return [{'name': name} for name in value]
+
+
+class RecipeImportSerializer(CachedFieldsModelSerializer):
+    """Serializer validating imported recipes"""
+    tags = AttrNameListField(required=False)
+    ingredients = AttrNameListField(required=False)
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
+        fields = RecipeDetailSerializer.Meta.fields
         read_only_fields = ['id']
-        extra_kwargs = {"image": {"required": "True"}}
+
+
+class BoundedImageField(serializers.ImageField):
+    """Image field enforcing byte and pixel limits before decoding.
+
+    The dimensions are read from the image header, so oversized uploads
+    and decompression bombs are rejected without decoding any pixels.
+    """
+    default_error_messages = {
+        'too_large': 'Image files may not be larger than {max_bytes} bytes.',
+        'too_many_pixels': 'Images may not have more than {max_pixels} pixels.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, UploadedFile):
+            # Only probe uploads; strings must never be opened as paths.
+            return super().to_internal_value(data)
+
+        max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+        if data.size > max_bytes:
+            self.fail('too_large', max_bytes=max_bytes)
+
+        if hasattr(data, 'temporary_file_path'):
+            source = data.temporary_file_path()
+        else:
+            source = data
+        try:
+            with Image.open(source) as image:
+                width, height = image.size
+        except Exception:
+            # Let the regular validation report unreadable files.
+            pass
+        else:
+            max_pixels = settings.RECIPE_IMAGE_MAX_PIXELS
+            if width * height > max_pixels:
+                self.fail('too_many_pixels', max_pixels=max_pixels)
+        finally:
+            data.seek(0)
+
+        return super().to_internal_value(data)
+
+
+class RecipeImageSerializer(CachedFieldsModelSerializer):
+    """Serializer for uploading images"""
+    image = BoundedImageField()
+    image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ['id', 'image', 'image_status', 'image_variants']
+        read_only_fields = ['id', 'image_status']
+
+    def update(self, instance, validated_data):
+        """Point the recipe at the blob holding the uploaded bytes."""
+        with transaction.atomic():
+            previous = instance.image.name
+            blob = ImageBlob.objects.acquire(validated_data['image'])
+            instance.image = blob.name
+            instance.save()
+            if previous:
+                ImageBlob.objects.release(previous)
+        return instance
+
+    def _file_url(self, instance, variant=None):
+        """Return the URL of the authorized image view."""
+        url = reverse('recipe:recipe-image-file', args=[instance.pk])
+        if variant is not None:
+            url = f'{url}?variant={variant}'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_image_variants(self, instance) -> dict:
+        """Return variant URLs once they have been rendered."""
+        if instance.image_status != Recipe.IMAGE_READY:
+            return {}
+        return {
+            variant: self._file_url(instance, variant)
+            for variant in instance.image_variants
+        }
+
+    def to_representation(self, instance):
+        """Link the image through the view checking the recipe owner."""
+        data = super().to_representation(instance)
+        if instance.image:
+            data['image'] = self._file_url(instance)
+        return data
@@ -0,0 +1,124 @@
+"""
+Signal handlers for recipe data changes.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core.models import ContentVersion, ImageBlob, Ingredient, Recipe, Tag
+from recipe.cache import attr_list_cache
+from recipe.search import supports_search_vectors, update_search_vectors
+
+
+def invalidate_attr_lists(user_id, *models):
+    """Drop cached attribute lists of a user once the transaction commits."""
+    for model in models:
+        model_name = model._meta.model_name
+        transaction.on_commit(
+            lambda model_name=model_name: attr_list_cache.invalidate(model_name, user_id)
+        )
+
+
+def refresh_search_vectors(recipe_ids):
+    """Recompute search vectors of recipes once the transaction commits."""
+    if supports_search_vectors():
+        recipe_ids = list(recipe_ids)
+        transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_content_version(sender, instance, **kwargs):
+    """Invalidate ETags of the owner of a changed object."""
+    ContentVersion.objects.bump(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_content_version_on_link(sender, instance, action, **kwargs):
+    """Invalidate ETags of the owner when recipe links change."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        ContentVersion.objects.bump(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_attr_list(sender, instance, **kwargs):
+    """Drop cached lists of the changed attribute model."""
+    invalidate_attr_lists(instance.user_id, sender)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_attr_lists_on_recipe_delete(sender, instance, **kwargs):
+    """Drop cached lists whose assigned_only filter depended on the recipe."""
+    invalidate_attr_lists(instance.user_id, Tag, Ingredient)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_attr_list_on_link(sender, instance, action, model, **kwargs):
+    """Drop cached lists of the attribute whose recipe links changed."""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        attr_model = Tag if sender is Recipe.tags.through else Ingredient
+        invalidate_attr_lists(instance.user_id, attr_model)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search_vector(sender, instance, **kwargs):
+    """Reindex a recipe whose title or description may have changed."""
+    refresh_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_search_vectors_on_link(sender, instance, action, reverse, pk_set, **kwargs):
+    """Reindex recipes whose tags or ingredients changed."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_search_vectors([instance.pk])
+    elif action == 'pre_clear' and supports_search_vectors():
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        refresh_search_vectors(getattr(instance, '_search_recipe_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        refresh_search_vectors(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def refresh_search_vectors_on_rename(sender, instance, created, **kwargs):
+    """Reindex recipes linked to a renamed tag or ingredient."""
+    if not created and supports_search_vectors():
+        refresh_search_vectors(instance.recipe_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def collect_recipes_for_search(sender, instance, **kwargs):
+    """Remember recipes linked to a tag or ingredient about to be deleted."""
+    if supports_search_vectors():
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_search_vectors_on_delete(sender, instance, **kwargs):
+    """Reindex recipes that lost a deleted tag or ingredient."""
+    refresh_search_vectors(getattr(instance, '_search_recipe_ids', []))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_blob(sender, instance, **kwargs):
+    """Drop the deleted recipe's reference to its image blob."""
+    if instance.image:
+        ImageBlob.objects.release(instance.image.name)
@@ -0,0 +1,90 @@
+"""
+Background processing of recipe images
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core.models import Recipe
+from recipe.images import render_variants, variant_name
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process pool shared by this worker, creating it lazily."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=settings.RECIPE_IMAGE_WORKERS)
+        return _executor
+
+
+def schedule_variants(recipe):
+    """Mark a recipe's image pending and render its variants after commit.
+
+    Rendering runs in the process pool, or inline when
+    ``RECIPE_IMAGE_WORKERS`` is 0.
+    """
+    recipe.image_status = Recipe.IMAGE_PENDING
+    recipe.image_variants = {}
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image_status=recipe.image_status,
+        image_variants=recipe.image_variants,
+    )
+    transaction.on_commit(
+        partial(_submit, recipe.pk, recipe.image.name, recipe.image.path)
+    )
+
+
+def _submit(recipe_id, name, path):
+    if not settings.RECIPE_IMAGE_WORKERS:
+        try:
+            paths = render_variants(path)
+        except Exception:
+            logger.exception('Rendering variants of %s failed', name)
+            paths = None
+        _store_variants(recipe_id, name, paths)
+        return
+
+    future = get_executor().submit(render_variants, path)
+    future.add_done_callback(partial(_finish, recipe_id, name))
+
+
+def _finish(recipe_id, name, future):
+    """Record the outcome of a pool job.
+
+    This usually runs in a pool management thread, whose connection is
+    closed afterwards. Jobs finished before the callback was added run it
+    in the submitting thread, whose connection is left alone.
+    """
+    try:
+        paths = future.result()
+    except Exception:
+        logger.exception('Rendering variants of %s failed', name)
+        paths = None
+    was_connected = connection.connection is not None
+    try:
+        _store_variants(recipe_id, name, paths)
+    finally:
+        if not was_connected:
+            connection.close()
+
+
+def _store_variants(recipe_id, name, paths):
+    """Save variant names, unless the recipe got another image meanwhile."""
+    if paths is None:
+        values = {'image_status': Recipe.IMAGE_FAILED}
+    else:
+        values = {
+            'image_status': Recipe.IMAGE_READY,
+            'image_variants': {variant: variant_name(name, variant) for variant in paths},
+        }
+    Recipe.objects.filter(pk=recipe_id, image=name).update(**values)
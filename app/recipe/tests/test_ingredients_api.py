@@ -3,6 +3,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from recipe.cache import attr_list_cache
 from core.models import Ingredient
 from recipe.serializers import IngredientSerializer
 from core.models import Recipe
@@ -34,6 +35,7 @@ class PrivateTestAPI(TestCase):
     def setUp(self):
         self.client = APIClient()
         self.user = create_user(email='khayalfarajov@gmail.com', password='testing321')
+        attr_list_cache.cache.clear()
 
         self.client.force_authenticate(self.user)
 
@@ -1,17 +1,43 @@
+import csv
+import hashlib
+import json
+import msgpack
 import tempfile
 import os
+import shutil
+from io import BytesIO
 from PIL import Image
-from django.test import TestCase
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from rest_framework import status
+from rest_framework import serializers, status
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import connection
+from django.db.models import Prefetch
+from django.db.models.signals import m2m_changed, post_delete
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from decimal import Decimal
-from core.models import Ingredient, Recipe, Tag
+from unittest.mock import patch
+from core.models import ContentVersion, ImageBlob, Ingredient, Recipe, Tag
 from django.contrib.auth import get_user_model
-from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.image_cache import resized_image_cache
+from recipe.pagination import RecipeCursorPagination
+from recipe.rows import RecipeRowSerializer
+from recipe.views import RecipeViewSet
+from recipe.serializers import (
+    CachedFieldsModelSerializer,
+    RecipeDetailSerializer,
+    RecipeImageSerializer,
+    RecipeSerializer,
+)
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+# Two 10x10 frames, written as MPO since Pillow 9.1 can only read them.
+MULTI_PICTURE_JPEG = os.path.join(os.path.dirname(__file__), 'fixtures', 'multi_picture.jpg')
 
 
 def detail_url(recipe_id):
@@ -256,6 +282,54 @@ class PrivateTestAPI(TestCase):
         self.assertNotIn(tag_lunch, recipe.tags.all())
         self.assertIn(tag_dinner, recipe.tags.all())
 
+    def test_update_with_unchanged_tags_skips_writes(self):
+        """Test resending the same tags does not rewrite the links."""
+        recipe = create_recipe(user=self.user)
+        tag_lunch = Tag.objects.create(user=self.user, name="Lunch")
+        tag_dinner = Tag.objects.create(user=self.user, name="Dinner")
+        recipe.tags.add(tag_lunch, tag_dinner)
+        link_ids = set(recipe.tags.through.objects.values_list('id', flat=True))
+        payload = {'tags': [{'name': 'Dinner'}, {'name': 'Lunch'}]}
+
+        changes = []
+
+        def receiver(sender, action, **kwargs):
+            changes.append(action)
+
+        m2m_changed.connect(receiver, sender=Recipe.tags.through)
+        self.addCleanup(m2m_changed.disconnect, receiver, sender=Recipe.tags.through)
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(changes, [])
+        writes = [
+            q['sql'] for q in queries.captured_queries
+            if 'core_recipe_tags' in q['sql']
+            and q['sql'].lstrip().upper().startswith(('INSERT', 'DELETE', 'UPDATE'))
+        ]
+        self.assertEqual(writes, [])
+        self.assertEqual(
+            set(recipe.tags.through.objects.values_list('id', flat=True)), link_ids
+        )
+
+    def test_update_tags_only_changes_difference(self):
+        """Test updating tags keeps links that are still requested."""
+        recipe = create_recipe(user=self.user)
+        tag_lunch = Tag.objects.create(user=self.user, name="Lunch")
+        tag_dinner = Tag.objects.create(user=self.user, name="Dinner")
+        recipe.tags.add(tag_lunch, tag_dinner)
+        kept_link = recipe.tags.through.objects.get(tag=tag_dinner)
+        payload = {'tags': [{'name': 'Dinner'}, {'name': 'Brunch'}]}
+
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(recipe.tags.values_list('name', flat=True)), {'Dinner', 'Brunch'}
+        )
+        self.assertTrue(recipe.tags.through.objects.filter(id=kept_link.id).exists())
+
     def test_clear_tags_on_update(self):
         """Test clearing a recipes tags."""
 
@@ -271,6 +345,19 @@ class PrivateTestAPI(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(recipe.tags.count(), 0)
 
+    def test_create_recipe_with_duplicate_tag_names(self):
+        """Test repeated tag names in one payload are linked once."""
+        payload = {
+            'title': 'Lentil soup',
+            'tags': [{'name': 'Soup'}, {'name': 'Soup'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+        self.assertEqual(Tag.objects.filter(user=self.user, name='Soup').count(), 1)
+
     def test_creating_recipe_with_new_ingredients(self):
         """Test for creating ingredients"""
         payload = {
@@ -402,6 +489,7 @@ class PrivateTestAPI(TestCase):
         self.assertNotIn(s3.data, res.data)
 
 
+@override_settings(RECIPE_IMAGE_WORKERS=0)
 class ImageUploadTests(TestCase):
     """Tests for the image upload API."""
 
@@ -431,6 +519,7 @@ class ImageUploadTests(TestCase):
         print(res.data['image'])
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn('image', res.data)
+        self.assertTrue(res.data['image'].endswith(image_file_url(self.recipe.id)))
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
     def test_upload_image_bad_request(self):
@@ -440,3 +529,1313 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_multi_picture_jpeg(self):
+        """Test multi picture JPEGs are stored and served as JPEG."""
+        url = image_upload_url(self.recipe.id)
+        with open(MULTI_PICTURE_JPEG, 'rb') as image_file:
+            res = self.client.post(url, {'image': image_file}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.jpg'))
+        res = self.client.get(image_file_url(self.recipe.id))
+        b''.join(res.streaming_content)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+
+    def _upload(self, size=(1200, 900)):
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', size).save(image_file, format='JPEG')
+            image_file.seek(0)
+            return self.client.post(url, {'image': image_file}, format='multipart')
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=100)
+    def test_upload_image_too_large(self):
+        """Test uploads over the byte limit are rejected."""
+        res = self._upload(size=(50, 50))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('100 bytes', str(res.data['image'][0]))
+
+    def test_upload_image_path_not_opened(self):
+        """Test a file path sent as a string is never opened."""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.flush()
+            with patch('recipe.serializers.Image.open') as image_open:
+                res = self.client.post(
+                    image_upload_url(self.recipe.id),
+                    {'image': image_file.name},
+                    format='multipart',
+                )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        image_open.assert_not_called()
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=10000)
+    def test_upload_image_too_many_pixels(self):
+        """Test images over the pixel limit are rejected from the header."""
+        with patch('PIL.ImageFile.ImageFile.load') as load:
+            res = self._upload(size=(101, 100))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('10000 pixels', str(res.data['image'][0]))
+        load.assert_not_called()
+
+    def test_upload_image_streams_to_disk(self):
+        """Test small uploads are written to a temporary file too."""
+        with patch(
+            'django.core.files.uploadhandler.TemporaryUploadedFile',
+            wraps=TemporaryUploadedFile,
+        ) as temporary_file:
+            res = self._upload(size=(10, 10))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        temporary_file.assert_called_once()
+
+    def test_upload_identical_images_stored_once(self):
+        """Test identical uploads share one content addressed file."""
+        other = create_recipe(user=self.user)
+        url = image_upload_url(other.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            content = image_file.read()
+            image_file.seek(0)
+            self.client.post(url, {'image': image_file}, format='multipart')
+            image_file.seek(0)
+            with patch('core.models.default_storage.save') as save:
+                res = self.client.post(
+                    image_upload_url(self.recipe.id), {'image': image_file},
+                    format='multipart',
+                )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        save.assert_not_called()
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(self.recipe.image.name, f'uploads/recipe/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(ImageBlob.objects.get(sha256=digest).ref_count, 2)
+
+    def test_replaced_image_collected(self):
+        """Test an image no recipe uses anymore is deleted."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(size=(10, 10))
+        self.recipe.refresh_from_db()
+        first = self.recipe.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload(size=(20, 20))
+        self.recipe.refresh_from_db()
+
+        self.assertNotEqual(self.recipe.image.name, first)
+        self.assertFalse(self.recipe.image.storage.exists(first))
+        self.assertEqual(
+            list(ImageBlob.objects.values_list('name', 'ref_count')),
+            [(self.recipe.image.name, 1)],
+        )
+
+    def test_deleted_recipe_releases_image(self):
+        """Test deleting a recipe releases its image."""
+        self._upload(size=(10, 10))
+        self.recipe.refresh_from_db()
+        name = self.recipe.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(detail_url(self.recipe.id))
+
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertFalse(self.recipe.image.storage.exists(name))
+
+    def test_upload_image_pending(self):
+        """Test the upload response reports variants as pending."""
+        res = self._upload()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(res.data['image_variants'], {})
+
+    def test_upload_image_renders_variants(self):
+        """Test variants are rendered once the upload commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        storage = self.recipe.image.storage
+        stem = os.path.splitext(self.recipe.image.name)[0]
+        self.assertEqual(self.recipe.image_variants, {
+            'thumbnail': f'{stem}_thumbnail.jpg',
+            'medium': f'{stem}_medium.jpg',
+            'webp': f'{stem}_webp.webp',
+        })
+        with Image.open(storage.path(self.recipe.image_variants['thumbnail'])) as img:
+            self.assertEqual(img.size, (200, 150))
+        with Image.open(storage.path(self.recipe.image_variants['webp'])) as img:
+            self.assertEqual(img.format, 'WEBP')
+
+        serializer = RecipeImageSerializer(self.recipe)
+        self.assertEqual(
+            serializer.data['image_variants']['medium'],
+            f'{image_file_url(self.recipe.id)}?variant=medium',
+        )
+        for name in self.recipe.image_variants.values():
+            storage.delete(name)
+
+    def test_upload_image_render_failure(self):
+        """Test a failed render marks the image as failed."""
+        with patch('recipe.tasks.render_variants', side_effect=OSError):
+            with self.assertLogs('recipe.tasks', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._upload()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertEqual(self.recipe.image_variants, {})
+
+    def test_variants_of_replaced_image_ignored(self):
+        """Test variants of an image replaced meanwhile are not stored."""
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self._upload()
+        self.recipe.refresh_from_db()
+        first = self.recipe.image.name
+        self._upload(size=(600, 450))
+
+        with patch('recipe.tasks.render_variants', return_value={'thumbnail': ''}):
+            callbacks[0]()
+
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, first)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+
+
+def image_url(recipe_id):
+    """Create and return a resized image URL."""
+    return reverse('recipe:recipe-image', args=[recipe_id])
+
+
+def get_image(client, recipe_id, params):
+    """Request a resized image and return the response and its content."""
+    res = client.get(image_url(recipe_id), params)
+    content = b''.join(res.streaming_content) if res.streaming else b''
+    return res, content
+
+
+def image_file_url(recipe_id):
+    """Create and return an authorized image file URL."""
+    return reverse('recipe:recipe-image-file', args=[recipe_id])
+
+
+class ImageFileTests(TestCase):
+    """Tests for the authorized image file API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.recipe.image.save('photo.jpg', ContentFile(b'image bytes'))
+
+    def tearDown(self):
+        self.recipe.image.delete()
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_accel_redirect(self):
+        """Test the transfer is handed to the proxy."""
+        res = self.client.get(image_file_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-media/{self.recipe.image.name}')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='')
+    def test_file_response_fallback(self):
+        """Test the file is streamed without a proxy prefix."""
+        res = self.client.get(image_file_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Accel-Redirect', res)
+        self.assertEqual(b''.join(res.streaming_content), b'image bytes')
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_variant(self):
+        """Test rendered variants are served and pending ones are not."""
+        res = self.client.get(image_file_url(self.recipe.id), {'variant': 'thumbnail'})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        Recipe.objects.filter(id=self.recipe.id).update(
+            image_status=Recipe.IMAGE_READY,
+            image_variants={'thumbnail': 'uploads/recipe/photo_thumbnail.jpg'},
+        )
+        res = self.client.get(image_file_url(self.recipe.id), {'variant': 'thumbnail'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'], '/protected-media/uploads/recipe/photo_thumbnail.jpg'
+        )
+
+    def test_invalid_variant(self):
+        """Test unknown variants return an error."""
+        res = self.client.get(image_file_url(self.recipe.id), {'variant': 'huge'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_other_users_recipe(self):
+        """Test images of other users' recipes are not served."""
+        other = get_user_model().objects.create_user('other@example.com', 'pass123')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(image_file_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('X-Accel-Redirect', res)
+
+    def test_unauthenticated(self):
+        """Test images require authentication."""
+        res = APIClient().get(image_file_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(RECIPE_IMAGE_WIDTHS=[50, 100], RECIPE_IMAGE_CACHE_DIR='test-cache')
+class ImageResizeTests(TestCase):
+    """Tests for the resized image API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        buffer = BytesIO()
+        Image.new('RGB', (400, 200)).save(buffer, format='JPEG')
+        self.recipe.image.save('photo.jpg', ContentFile(buffer.getvalue()))
+        # Start every test without a size estimate from earlier tests.
+        for name, value in (('_estimated_bytes', None), ('_scanned_at', 0.0)):
+            patcher = patch.object(resized_image_cache, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.recipe.image.delete()
+        shutil.rmtree(resized_image_cache.root, ignore_errors=True)
+
+    def test_resize_rounds_up_to_bucket(self):
+        """Test the image is resized to the next configured width."""
+        res, content = get_image(self.client, self.recipe.id, {'w': 60, 'fmt': 'webp'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        with Image.open(BytesIO(content)) as img:
+            self.assertEqual(img.format, 'WEBP')
+            self.assertEqual(img.size, (100, 50))
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_resized_accel_redirect(self):
+        """Test resized images are handed to the proxy."""
+        res = self.client.get(image_url(self.recipe.id), {'w': 50})
+
+        path = resized_image_cache.path(self.recipe.image.name, 50, 'jpeg')
+        name = os.path.relpath(path, settings.MEDIA_ROOT)
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected-media/{name}')
+
+    def test_cache_hit_skips_pillow(self):
+        """Test a cached image is served without rendering it again."""
+        get_image(self.client, self.recipe.id, {'w': 50})
+
+        with patch('recipe.image_cache.render_width') as render_width:
+            res, content = get_image(self.client, self.recipe.id, {'w': 50})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        render_width.assert_not_called()
+
+    def test_evicted_after_render_still_served(self):
+        """Test an image evicted right after rendering is still served."""
+        path = resized_image_cache.path(self.recipe.image.name, 50, 'jpeg')
+
+        def added(size, keep):
+            # Another worker's eviction removed the fresh file.
+            os.unlink(path)
+
+        with patch.object(resized_image_cache, '_added', added):
+            res, content = get_image(self.client, self.recipe.id, {'w': 50})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Image.open(BytesIO(content)).size, (50, 25))
+        self.assertEqual(res['Content-Length'], str(len(content)))
+
+    def test_evicted_after_hit_still_read(self):
+        """Test a cached image evicted once opened is still read."""
+        res, content = get_image(self.client, self.recipe.id, {'w': 50})
+        path = resized_image_cache.path(self.recipe.image.name, 50, 'jpeg')
+
+        with resized_image_cache.open(
+            self.recipe.image.path, self.recipe.image.name, 50, 'jpeg',
+        ) as file:
+            os.unlink(path)
+            self.assertEqual(file.read(), content)
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache evicts the least recently used files first."""
+        get_image(self.client, self.recipe.id, {'w': 50})
+        small = resized_image_cache.path(self.recipe.image.name, 50, 'jpeg')
+        os.utime(small, (0, 0))
+        get_image(self.client, self.recipe.id, {'w': 100})
+        large = resized_image_cache.path(self.recipe.image.name, 100, 'jpeg')
+
+        with self.settings(RECIPE_IMAGE_CACHE_MAX_BYTES=os.path.getsize(large)), \
+                patch.object(resized_image_cache, 'low_water', 1.0):
+            resized_image_cache.evict()
+
+        self.assertFalse(os.path.exists(small))
+        self.assertTrue(os.path.exists(large))
+
+    def test_miss_under_limit_skips_scan(self):
+        """Test misses only scan the cache once its estimated size is past the limit."""
+        get_image(self.client, self.recipe.id, {'w': 50})
+
+        with patch('recipe.image_cache.os.walk', wraps=os.walk) as walk:
+            get_image(self.client, self.recipe.id, {'w': 100})
+            walk.assert_not_called()
+
+            with self.settings(RECIPE_IMAGE_CACHE_MAX_BYTES=1):
+                get_image(self.client, self.recipe.id, {'w': 100, 'fmt': 'webp'})
+            walk.assert_called()
+
+    def test_evict_leaves_temporary_files(self):
+        """Test eviction skips files another worker is still writing."""
+        get_image(self.client, self.recipe.id, {'w': 50})
+        path = resized_image_cache.path(self.recipe.image.name, 50, 'jpeg')
+        tmp_path = os.path.join(os.path.dirname(path), 'rendering.tmp')
+        with open(tmp_path, 'wb') as tmp_file:
+            tmp_file.write(b'partial')
+
+        with self.settings(RECIPE_IMAGE_CACHE_MAX_BYTES=0):
+            resized_image_cache.evict()
+
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(tmp_path))
+
+    def test_render_error_survives_removed_temporary_file(self):
+        """Test a render error is raised when its temporary file is gone."""
+        path = resized_image_cache.path(self.recipe.image.name, 50, 'jpeg')
+
+        def render_width(source, dest, width, fmt):
+            # Another worker's eviction removed the temporary file.
+            for filename in os.listdir(os.path.dirname(path)):
+                os.unlink(os.path.join(os.path.dirname(path), filename))
+            raise ValueError('render failed')
+
+        with patch('recipe.image_cache.render_width', render_width):
+            with self.assertRaisesMessage(ValueError, 'render failed'):
+                resized_image_cache.open(
+                    self.recipe.image.path, self.recipe.image.name, 50, 'jpeg',
+                )
+
+    def test_invalid_params(self):
+        """Test invalid widths and formats return errors."""
+        for params in ({'w': 'wide'}, {'w': 0}, {'fmt': 'gif'}):
+            res = self.client.get(image_url(self.recipe.id), params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_image(self):
+        """Test recipes without an image return not found."""
+        recipe = create_recipe(user=self.user)
+
+        res = self.client.get(image_url(recipe.id), HTTP_ACCEPT='image/*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_other_users_recipe(self):
+        """Test images of other users' recipes are not served."""
+        other = get_user_model().objects.create_user('other@example.com', 'pass123')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class ExportTests(TestCase):
+    """Tests for the streaming export API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(5):
+            recipe = create_recipe(
+                user=self.user, title=f'Recipe {i}', price=Decimal('2.50'),
+            )
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'Tag {i}'))
+        other = get_user_model().objects.create_user('other@example.com', 'pass123')
+        create_recipe(user=other, title='Not mine')
+
+    def test_export_ndjson(self):
+        """Test recipes stream as one JSON document per line."""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        serializer = RecipeDetailSerializer(recipes, many=True)
+        self.assertEqual(records, json.loads(json.dumps(serializer.data)))
+
+    def test_export_csv(self):
+        """Test recipes stream as CSV rows with joined names."""
+        res = self.client.get(EXPORT_URL, {'fmt': 'csv', 'tags': Tag.objects.first().id})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(
+            b''.join(res.streaming_content).decode().splitlines()
+        ))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Recipe 0')
+        self.assertEqual(rows[0]['tags'], 'Tag 0')
+        self.assertEqual(rows[0]['price'], '2.50')
+
+    def test_export_prefetches_per_chunk(self):
+        """Test relations are prefetched once per chunk of recipes."""
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL)
+            with self.assertNumQueries(1 + 3 * 2):
+                lines = list(res.streaming_content)
+
+        self.assertEqual(len(lines), 5)
+
+    def test_export_invalid_format(self):
+        """Test unknown export formats return an error."""
+        res = self.client.get(EXPORT_URL, {'fmt': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+
+
+class ImportTests(TestCase):
+    """Tests for the bulk NDJSON import API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def _import(self, records):
+        lines = [
+            record if isinstance(record, str) else json.dumps(record)
+            for record in records
+        ]
+        body = '\n'.join(lines) + '\n'
+        return self.client.post(IMPORT_URL, body, content_type='application/x-ndjson')
+
+    def test_import_reports_errors_per_line(self):
+        """Test valid lines are imported and invalid ones reported."""
+        res = self._import([
+            {'title': 'Soup', 'time_in_minutes': 10, 'price': '2.50'},
+            '{not json',
+            '',
+            {'time_in_minutes': 5},
+            {'title': 'Salad', 'price': '1.00', 'description': 'Green'},
+            {'title': 'Stew', 'tags': ['Vegan']},
+            {'title': 'Pie', 'tags': [{'name': 'x' * 256}]},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['failed'], 4)
+        self.assertEqual([error['line'] for error in res.data['errors']], [2, 4, 6, 7])
+        self.assertIn('title', res.data['errors'][1]['errors'])
+        self.assertIn('tags', res.data['errors'][2]['errors'])
+        self.assertIn('tags', res.data['errors'][3]['errors'])
+        self.assertEqual(
+            sorted(Recipe.objects.filter(user=self.user).values_list('title', flat=True)),
+            ['Salad', 'Soup'],
+        )
+
+    def test_import_resolves_names(self):
+        """Test tags and ingredients are reused or created per user."""
+        existing = Tag.objects.create(user=self.user, name='Vegan')
+        other = get_user_model().objects.create_user('other@example.com', 'pass123')
+        Tag.objects.create(user=other, name='Quick')
+
+        res = self._import([
+            {'title': 'Soup', 'tags': [{'name': 'Vegan'}, {'name': 'Quick'}],
+             'ingredients': [{'name': 'Salt'}, {'name': 'Salt'}]},
+            {'title': 'Salad', 'tags': [{'name': 'Quick'}]},
+        ])
+
+        self.assertEqual(res.data['created'], 2)
+        soup = Recipe.objects.get(user=self.user, title='Soup')
+        salad = Recipe.objects.get(user=self.user, title='Salad')
+        quick = Tag.objects.get(user=self.user, name='Quick')
+        self.assertEqual(set(soup.tags.all()), {existing, quick})
+        self.assertEqual(list(salad.tags.all()), [quick])
+        self.assertEqual(list(soup.ingredients.values_list('name', flat=True)), ['Salt'])
+
+    def test_import_queries_per_batch(self):
+        """Test the number of queries does not grow with the records."""
+        records = [
+            {'title': f'Recipe {i}', 'tags': [{'name': f'Tag {i % 3}'}]}
+            for i in range(50)
+        ]
+
+        with patch.object(RecipeViewSet, 'import_batch_size', 25):
+            with CaptureQueriesContext(connection) as queries:
+                res = self._import(records)
+
+        self.assertEqual(res.data['created'], 50)
+        self.assertLessEqual(len(queries), 2 * 12)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+
+    def test_import_refreshes_caches(self):
+        """Test imports bump the content version and drop cached lists."""
+        ContentVersion.objects.current(self.user.id)
+
+        with patch('recipe.signals.attr_list_cache.invalidate') as invalidate:
+            with self.captureOnCommitCallbacks(execute=True):
+                self._import([{'title': 'Soup', 'tags': [{'name': 'Vegan'}]}])
+
+        self.assertEqual(ContentVersion.objects.current(self.user.id), 1)
+        invalidate.assert_any_call('tag', self.user.id)
+
+
+class BulkOperationTests(TestCase):
+    """Tests for bulk operations on the recipes collection."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+        self.other = get_user_model().objects.create_user('other@example.com', 'pass123')
+
+    def test_bulk_create(self):
+        """Test creating many recipes reports a result per item."""
+        payload = [
+            {'title': 'Soup', 'price': '2.50', 'tags': [{'name': 'Vegan'}]},
+            {'price': '1.00'},
+            {'title': 'Salad', 'ingredients': [{'name': 'Kale'}], 'tags': [{'name': 'Vegan'}]},
+        ]
+
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in res.data], [201, 400, 201])
+        self.assertIn('title', res.data[1]['errors'])
+        soup = Recipe.objects.get(id=res.data[0]['data']['id'])
+        self.assertEqual(soup.user, self.user)
+        self.assertEqual(res.data[0]['data'], RecipeDetailSerializer(soup).data)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        salad = Recipe.objects.get(title='Salad')
+        self.assertEqual(list(salad.ingredients.values_list('name', flat=True)), ['Kale'])
+
+    def test_bulk_partial_update(self):
+        """Test updating many recipes only touches the user's recipes."""
+        soup = create_recipe(user=self.user, title='Soup')
+        soup.tags.add(Tag.objects.create(user=self.user, name='Old'))
+        salad = create_recipe(user=self.user, title='Salad', time_in_minutes=5)
+        foreign = create_recipe(user=self.other, title='Foreign')
+        payload = [
+            {'id': soup.id, 'title': 'Tomato soup', 'tags': [{'name': 'New'}]},
+            {'id': salad.id, 'time_in_minutes': 7},
+            {'id': foreign.id, 'title': 'Mine now'},
+            {'id': soup.id, 'title': 'Twice'},
+            {'id': salad.id + 1000, 'title': 'Missing'},
+            {'title': 'No id'},
+            {'id': salad.id, 'price': 'free'},
+        ]
+
+        res = self.client.patch(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(
+            [item['status'] for item in res.data], [200, 200, 404, 400, 404, 400, 400]
+        )
+        soup.refresh_from_db()
+        salad.refresh_from_db()
+        foreign.refresh_from_db()
+        self.assertEqual(soup.title, 'Tomato soup')
+        self.assertEqual(list(soup.tags.values_list('name', flat=True)), ['New'])
+        self.assertEqual(salad.title, 'Salad')
+        self.assertEqual(salad.time_in_minutes, 7)
+        self.assertEqual(foreign.title, 'Foreign')
+        self.assertEqual(res.data[1]['data']['time_in_minutes'], 7)
+
+    def test_bulk_partial_update_queries(self):
+        """Test bulk updates run a fixed number of queries."""
+        recipes = [create_recipe(user=self.user, title=f'Recipe {i}') for i in range(10)]
+
+        def update(recipes):
+            payload = [
+                {'id': recipe.id, 'title': 'Updated', 'tags': [{'name': f'Tag {recipe.id}'}]}
+                for recipe in recipes
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.patch(RECIPE_URL, payload, format='json')
+            return len(queries)
+
+        self.assertEqual(update(recipes[:2]), update(recipes[2:]))
+
+    def test_bulk_destroy(self):
+        """Test deleting many recipes only deletes the user's recipes."""
+        soup = create_recipe(user=self.user, title='Soup')
+        soup.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+        salad = create_recipe(user=self.user, title='Salad')
+        foreign = create_recipe(user=self.other, title='Foreign')
+
+        res = self.client.delete(
+            RECIPE_URL, [soup.id, {'id': salad.id}, foreign.id, soup.id], format='json'
+        )
+
+        self.assertEqual([item['status'] for item in res.data], [204, 204, 404, 404])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        self.assertTrue(Recipe.objects.filter(id=foreign.id).exists())
+        self.assertFalse(Recipe.tags.through.objects.exists())
+
+    def test_bulk_destroy_sends_delete_signals(self):
+        """Test deleting many recipes runs the recipe delete signals."""
+        recipes = [create_recipe(user=self.user, title=f'Recipe {i}') for i in range(2)]
+        version = ContentVersion.objects.current(self.user.pk)
+        deleted = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted.append(instance.id)
+
+        post_delete.connect(receiver, sender=Recipe)
+        try:
+            self.client.delete(RECIPE_URL, [recipe.id for recipe in recipes], format='json')
+        finally:
+            post_delete.disconnect(receiver, sender=Recipe)
+
+        self.assertCountEqual(deleted, [recipe.id for recipe in recipes])
+        self.assertGreater(ContentVersion.objects.current(self.user.pk), version)
+
+    def test_bulk_rejects_boolean_ids(self):
+        """Test true is not taken as the id 1."""
+        recipe = create_recipe(user=self.user, id=1, title='First')
+
+        res = self.client.delete(RECIPE_URL, [True, {'id': True}], format='json')
+        self.assertEqual([item['status'] for item in res.data], [404, 404])
+
+        res = self.client.patch(RECIPE_URL, [{'id': True, 'title': 'Changed'}], format='json')
+        self.assertEqual(res.data[0]['status'], status.HTTP_400_BAD_REQUEST)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'First')
+
+    def test_bulk_destroy_releases_images(self):
+        """Test deleting many recipes releases their images."""
+        recipe = create_recipe(user=self.user)
+        blob = ImageBlob.objects.acquire(ContentFile(b'image bytes', name='photo.jpg'))
+        Recipe.objects.filter(id=recipe.id).update(image=blob.name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(RECIPE_URL, [recipe.id], format='json')
+
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_bulk_payload_must_be_list(self):
+        """Test bulk operations reject payloads that are not lists."""
+        res = self.client.patch(RECIPE_URL, {'id': 1}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch.object(RecipeViewSet, 'bulk_max_items', 1):
+            res = self.client.delete(RECIPE_URL, [1, 2], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryBudgetTests(TestCase):
+    """Tests that recipe endpoints run a constant number of queries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='budget@example.com', password='testing321')
+        self.client.force_authenticate(self.user)
+        ContentVersion.objects.current(self.user.pk)
+
+    def _create_recipes(self, count):
+        """Create recipes with a tag and an ingredient each."""
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f'Tag {i}'))
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'Ingredient {i}')
+            )
+
+    def test_list_query_budget(self):
+        """Test listing recipes does not scale queries with result size."""
+        self._create_recipes(10)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+
+    def test_retrieve_query_budget(self):
+        """Test retrieving a recipe loads tags and ingredients in one query each."""
+        self._create_recipes(3)
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 1)
+
+    def test_create_query_budget(self):
+        """Test creating a recipe without nested objects."""
+        payload = {'title': 'Budget recipe', 'time_in_minutes': 5, 'price': Decimal('1.00')}
+
+        with self.assertNumQueries(4):
+            res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_with_nested_query_budget(self):
+        """Test creating a recipe resolves tags and ingredients in bulk."""
+        Tag.objects.create(user=self.user, name='Tag 0')
+        payload = {
+            'title': 'Budget recipe',
+            'tags': [{'name': f'Tag {i}'} for i in range(30)],
+            'ingredients': [{'name': f'Ingredient {i}'} for i in range(40)],
+        }
+
+        with self.assertNumQueries(16):
+            res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 40)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 30)
+
+    def test_update_query_budget(self):
+        """Test updating a recipe does not reload its relations per object."""
+        self._create_recipes(3)
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        with self.assertNumQueries(7):
+            res = self.client.patch(detail_url(recipe.id), {'title': 'Updated'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['ingredients']), 1)
+
+
+class PaginationTests(TestCase):
+    """Tests for opt-in cursor pagination of recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='pages@example.com', password='testing321')
+        self.client.force_authenticate(self.user)
+
+    def test_list_unpaginated_by_default(self):
+        """Test recipes are returned as a plain list without pagination params."""
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data, list)
+
+    def test_walk_pages_with_cursor(self):
+        """Test following next links returns every recipe once in id order."""
+        recipes = [create_recipe(user=self.user, title=f'R{i}') for i in range(5)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        seen = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen.extend(item['id'] for item in res.data['results'])
+
+        self.assertEqual(seen, [recipe.id for recipe in recipes])
+        self.assertIsNone(res.data['next'])
+
+    def test_page_size_capped(self):
+        """Test the client page size cannot exceed the server maximum."""
+        for i in range(3):
+            create_recipe(user=self.user, title=f'R{i}')
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPE_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_pagination_with_tag_filter(self):
+        """Test paginating composes with the tag filter."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        tagged = []
+        for i in range(4):
+            recipe = create_recipe(user=self.user, title=f'R{i}')
+            if i % 2 == 0:
+                recipe.tags.add(tag)
+                tagged.append(recipe.id)
+
+        res = self.client.get(RECIPE_URL, {'tags': tag.id, 'page_size': 1})
+        seen = [item['id'] for item in res.data['results']]
+        res = self.client.get(res.data['next'])
+        seen.extend(item['id'] for item in res.data['results'])
+
+        self.assertEqual(seen, tagged)
+        self.assertIsNone(res.data['next'])
+
+
+class ConditionalGetTests(TestCase):
+    """Tests for ETag handling on recipe reads."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='etag@example.com', password='testing321')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_list_not_modified(self):
+        """Test a matching If-None-Match returns 304 with one query."""
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(res.content, b'')
+
+    def test_detail_not_modified(self):
+        """Test the detail endpoint honours If-None-Match."""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_wildcard_missing_recipe(self):
+        """Test If-None-Match: * does not hide a missing or foreign recipe."""
+        other = create_user(email='other-etag@example.com', password='testing321')
+        foreign = create_recipe(user=other)
+
+        for recipe_id in (foreign.id, foreign.id + 1000):
+            res = self.client.get(detail_url(recipe_id), HTTP_IF_NONE_MATCH='*')
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.get(detail_url(self.recipe.id), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_changes_etag(self):
+        """Test changing a recipe invalidates earlier ETags."""
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Changed'})
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_tag_link_changes_etag(self):
+        """Test linking a tag to a recipe invalidates earlier ETags."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_varies_by_query(self):
+        """Test filtered lists get their own ETag."""
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(RECIPE_URL, {'page_size': 1})
+
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_other_user_write_keeps_etag(self):
+        """Test another user's writes do not invalidate the ETag."""
+        other = create_user(email='other@example.com', password='testing321')
+        etag = self.client.get(RECIPE_URL)['ETag']
+        create_recipe(user=other)
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class SearchTests(TestCase):
+    """Tests for full-text recipe search."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='search@example.com', password='testing321')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipe(self, **params):
+        """Create a recipe and index it as a committed write would."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_recipe(user=self.user, **params)
+
+    def _search(self, text, **params):
+        res = self.client.get(RECIPE_URL, {'search': text, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in res.data]
+
+    def test_search_title_and_description(self):
+        """Test searching matches titles and descriptions."""
+        curry = self._create_recipe(title='Thai curry', description='Spicy coconut')
+        self._create_recipe(title='Pancakes', description='Sweet breakfast')
+
+        self.assertEqual(self._search('curry'), [curry.id])
+        self.assertEqual(self._search('coconut'), [curry.id])
+
+    def test_search_tags_and_ingredients(self):
+        """Test searching matches linked tag and ingredient names."""
+        recipe = self._create_recipe(title='Soup')
+        self._create_recipe(title='Salad')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(Tag.objects.create(user=self.user, name='Winter'))
+            recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Lentils'))
+
+        self.assertEqual(self._search('winter'), [recipe.id])
+        self.assertEqual(self._search('lentils'), [recipe.id])
+
+    def test_search_tag_rename_reindexes(self):
+        """Test renaming a tag updates the recipes it is linked to."""
+        recipe = self._create_recipe(title='Soup')
+        tag = Tag.objects.create(user=self.user, name='Winter')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+            tag.name = 'Autumn'
+            tag.save()
+
+        self.assertEqual(self._search('autumn'), [recipe.id])
+        self.assertEqual(self._search('winter'), [])
+
+    def test_search_ranks_title_first(self):
+        """Test recipes matching in the title rank above other matches."""
+        in_description = self._create_recipe(title='Stew', description='Mushroom stew')
+        in_title = self._create_recipe(title='Mushroom risotto', description='Creamy rice')
+
+        self.assertEqual(self._search('mushroom'), [in_title.id, in_description.id])
+
+    def test_search_with_tag_filter(self):
+        """Test search combines with the tag filter."""
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        vegan = self._create_recipe(title='Bean chili')
+        self._create_recipe(title='Beef chili')
+        vegan.tags.add(tag)
+
+        self.assertEqual(self._search('chili', tags=str(tag.id)), [vegan.id])
+
+    def test_search_limited_to_user(self):
+        """Test search only returns the user's own recipes."""
+        other = create_user(email='other@example.com', password='testing321')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(user=other, title='Thai curry')
+
+        self.assertEqual(self._search('curry'), [])
+
+
+class MatchFilterTests(TestCase):
+    """Tests for any/all matching of tag and ingredient filters."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='match@example.com', password='testing321')
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.both = create_recipe(user=self.user, title='Quick vegan bowl')
+        self.both.tags.add(self.vegan, self.quick)
+        self.only_vegan = create_recipe(user=self.user, title='Vegan stew')
+        self.only_vegan.tags.add(self.vegan)
+
+    def _ids(self, **params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in res.data]
+
+    def test_match_any_is_default(self):
+        """Test recipes with any requested tag are returned once each."""
+        tags = f'{self.vegan.id},{self.quick.id}'
+
+        self.assertEqual(self._ids(tags=tags), [self.both.id, self.only_vegan.id])
+        self.assertEqual(self._ids(tags=tags, match='any'), [self.both.id, self.only_vegan.id])
+
+    def test_match_all_tags(self):
+        """Test match=all only returns recipes having every tag."""
+        tags = f'{self.vegan.id},{self.quick.id}'
+
+        self.assertEqual(self._ids(tags=tags, match='all'), [self.both.id])
+
+    def test_match_all_tags_and_ingredients(self):
+        """Test match=all applies to tags and ingredients together."""
+        tofu = Ingredient.objects.create(user=self.user, name='Tofu')
+        self.only_vegan.ingredients.add(tofu)
+
+        ids = self._ids(tags=str(self.vegan.id), ingredients=str(tofu.id), match='all')
+
+        self.assertEqual(ids, [self.only_vegan.id])
+
+    def test_match_invalid(self):
+        """Test an unknown match mode is rejected."""
+        res = self.client.get(RECIPE_URL, {'tags': str(self.vegan.id), 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_query_has_no_join(self):
+        """Test tag filtering neither joins the through table nor deduplicates."""
+        with CaptureQueriesContext(connection) as queries:
+            self._ids(tags=f'{self.vegan.id},{self.quick.id}', match='all')
+
+        recipe_query = next(
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "core_recipe"' in q['sql']
+        )
+        self.assertNotIn('DISTINCT', recipe_query)
+        self.assertNotIn('JOIN', recipe_query)
+
+
+class SparseFieldsetTests(TestCase):
+    """Tests for the fields and expand query parameters."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='fields@example.com', password='testing321')
+        self.client.force_authenticate(self.user)
+        ContentVersion.objects.current(self.user.pk)
+        self.recipe = create_recipe(
+            user=self.user, title='Sparse', time_in_minutes=5,
+            price=Decimal('2.50'), description='Long text',
+        )
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def test_fields_prunes_response(self):
+        """Test only the requested fields are rendered."""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{'id': self.recipe.id, 'title': 'Sparse'}])
+
+    def test_fields_skips_unrequested_columns_and_relations(self):
+        """Test unrequested columns and relations are not fetched."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(detail_url(self.recipe.id), {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        sql = '\n'.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('core_tag', sql)
+        self.assertNotIn('core_ingredient', sql)
+
+    def test_list_does_not_fetch_description(self):
+        """Test listing recipes leaves out the description column."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['tags'], [{'id': self.tag.id, 'name': 'Vegan'}])
+        sql = '\n'.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('description', sql)
+
+    def test_detail_fields_include_description(self):
+        """Test the detail fieldset can select the description."""
+        res = self.client.get(detail_url(self.recipe.id), {'fields': 'description'})
+
+        self.assertEqual(res.data, {'description': 'Long text'})
+
+    def test_expand_renders_other_relations_as_ids(self):
+        """Test relations that are not expanded render as id lists."""
+        res = self.client.get(detail_url(self.recipe.id), {'expand': 'tags'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'], [{'id': self.tag.id, 'name': 'Vegan'}])
+        self.assertEqual(res.data['ingredients'], [self.ingredient.id])
+
+    def test_empty_expand_renders_ids(self):
+        """Test an empty expand renders every relation as ids."""
+        res = self.client.get(RECIPE_URL, {'expand': '', 'fields': 'tags,ingredients'})
+
+        self.assertEqual(res.data, [{'tags': [self.tag.id], 'ingredients': [self.ingredient.id]}])
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown field and expand names return a 400."""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,description'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+        res = self.client.get(RECIPE_URL, {'expand': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', res.data)
+
+
+class RecipeRowSerializerTests(TestCase):
+    """Tests that row rendering matches the recipe serializers."""
+
+    def setUp(self):
+        self.user = create_user(email='rows@example.com', password='testing321')
+        tags = [Tag.objects.create(user=self.user, name=f'Tag \u2028{i}') for i in range(3)]
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        full = create_recipe(
+            user=self.user, title='Caf\u00e9', time_in_minutes=5,
+            price=Decimal('2.50'), description='Line\nbreak', link='http://x.io',
+        )
+        full.tags.add(tags[2], tags[0])
+        full.ingredients.add(ingredient)
+        create_recipe(user=self.user, title='Bare', price=Decimal('10'))
+        create_recipe(user=self.user, title='Tagged').tags.add(tags[1], tags[2])
+
+    def _serializer_json(self, fields=None, expand=None):
+        queryset = Recipe.objects.order_by('id').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.order_by('id')),
+        )
+        data = RecipeDetailSerializer(
+            queryset, many=True, fields=fields, expand=expand,
+        ).data
+        return JSONRenderer().render(data)
+
+    def _rows_json(self, fields=None, expand=None):
+        rows = RecipeRowSerializer(fields or RecipeDetailSerializer.Meta.fields, expand)
+        data = rows.serialize(rows.values(Recipe.objects.order_by('id')))
+        return JSONRenderer().render(data)
+
+    def test_rows_match_serializer(self):
+        """Test rows render byte for byte like the serializer."""
+        self.assertEqual(self._rows_json(), self._serializer_json())
+
+    def test_rows_match_serializer_with_fieldset(self):
+        """Test rows honour fields and expand like the serializer."""
+        for fields, expand in (
+            (['price', 'id'], None),
+            (['title', 'tags', 'ingredients'], ['ingredients']),
+            (['tags'], []),
+        ):
+            with self.subTest(fields=fields, expand=expand):
+                self.assertEqual(
+                    self._rows_json(fields, expand),
+                    self._serializer_json(fields, expand),
+                )
+
+    def test_rows_query_count(self):
+        """Test rows read each relation in a single query."""
+        rows = RecipeRowSerializer(RecipeDetailSerializer.Meta.fields)
+
+        with self.assertNumQueries(3):
+            data = rows.serialize(rows.values(Recipe.objects.all()))
+
+        self.assertEqual(len(data), 3)
+
+
+class CachedFieldsSerializerTests(TestCase):
+    """Tests for serializers building their fields once per class."""
+
+    def test_fields_built_once_per_class(self):
+        """Test the model is introspected once per serializer class."""
+        class TitleSerializer(CachedFieldsModelSerializer):
+            class Meta:
+                model = Recipe
+                fields = ['id', 'title']
+
+        class DetailedTitleSerializer(TitleSerializer):
+            class Meta(TitleSerializer.Meta):
+                fields = ['id', 'title', 'description']
+
+        with patch(
+            'rest_framework.serializers.ModelSerializer.get_fields',
+            autospec=True,
+            side_effect=serializers.ModelSerializer.get_fields,
+        ) as get_fields:
+            for _ in range(3):
+                self.assertEqual(list(TitleSerializer().fields), ['id', 'title'])
+                self.assertEqual(
+                    list(DetailedTitleSerializer().fields), ['id', 'title', 'description'],
+                )
+
+        self.assertEqual(get_fields.call_count, 2)
+
+    def test_instances_get_their_own_fields(self):
+        """Test fields are bound per instance, not shared."""
+        first = RecipeSerializer(context={'name': 'first'})
+        second = RecipeSerializer(context={'name': 'second'})
+        first.fields.pop('title')
+
+        self.assertIn('title', second.fields)
+        self.assertIsNot(first.fields['price'], second.fields['price'])
+        self.assertIs(second.fields['price'].parent, second)
+        self.assertIs(second.fields['tags'].child.root, second)
+        self.assertEqual(second.fields['tags'].child.context, {'name': 'second'})
+
+
+class ResponseFormatTests(TestCase):
+    """Tests for the columnar JSON and MessagePack recipe formats."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='formats@example.com', password='testing321')
+        self.client.force_authenticate(self.user)
+        ContentVersion.objects.current(self.user.pk)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        for i in range(2):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}', price=Decimal('1.50'))
+            recipe.tags.add(self.tag)
+
+    def test_list_columnar(self):
+        """Test listing recipes as columnar JSON shares tags in a side table."""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/vnd.columnar+json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/vnd.columnar+json')
+        body = json.loads(res.content)
+        self.assertEqual(body['columns'], RecipeSerializer.Meta.fields)
+        self.assertEqual([row[1] for row in body['rows']], ['Recipe 0', 'Recipe 1'])
+        self.assertEqual([row[-2] for row in body['rows']], [[self.tag.id], [self.tag.id]])
+        self.assertEqual(body['related']['tags']['rows'], [[self.tag.id, 'Vegan']])
+
+    def test_list_msgpack(self):
+        """Test listing recipes as MessagePack decodes to the JSON data."""
+        msgpack_res = self.client.get(RECIPE_URL, {'format': 'msgpack'})
+        json_res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(msgpack_res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(msgpack_res.content), json.loads(json_res.content))
+        self.assertNotEqual(msgpack_res['ETag'], json_res['ETag'])
+
+    def test_tags_columnar(self):
+        """Test attribute lists can be sent as columnar JSON."""
+        res = self.client.get(
+            reverse('recipe:tag-list'), HTTP_ACCEPT='application/vnd.columnar+json',
+        )
+
+        self.assertEqual(json.loads(res.content), {
+            'columns': ['id', 'name'], 'rows': [[self.tag.id, 'Vegan']], 'related': {},
+        })
@@ -3,7 +3,8 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from core.models import Tag, Recipe
+from recipe.cache import attr_list_cache
+from core.models import Ingredient, Tag, Recipe
 from recipe.serializers import TagSerializer
 from decimal import Decimal
 
@@ -33,6 +34,7 @@ class PrivateTestAPI(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
         self.user = create_user(email='khayalfarajov@gmail.com', password='testing321')
+        attr_list_cache.cache.clear()
 
         self.client.force_authenticate(self.user)
 
@@ -61,6 +63,79 @@ class PrivateTestAPI(TestCase):
         self.assertEqual(res.data[0]['name'], tag.name)
         self.assertEqual(res.data[0]['id'], tag.id)
 
+    def test_tags_paginated_with_count(self):
+        """Test tags can be paginated and report whether the count is exact"""
+        for i in range(3):
+            Tag.objects.create(user=self.user, name=f"tag{i}")
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertTrue(res.data['count_is_exact'])
+        self.assertEqual([t['name'] for t in res.data['results']], ['tag2', 'tag1'])
+        self.assertIsNotNone(res.data['next'])
+
+    def test_tags_not_modified(self):
+        """Test the tag list honours If-None-Match until a tag changes"""
+        tag = Tag.objects.create(user=self.user, name="tag1")
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(detail_url(tag.id), {'name': 'tag2'})
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tags_served_from_cache(self):
+        """Test a repeated tag list is served from the cache"""
+        Tag.objects.create(user=self.user, name="tag1")
+        self.client.get(TAGS_URL)
+        attr_list_cache.reset_stats()
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in res.data], ['tag1'])
+        self.assertEqual(attr_list_cache.stats()['hits'], 1)
+
+    def test_tag_change_invalidates_cache(self):
+        """Test changing a tag drops the cached lists of its user"""
+        tag = Tag.objects.create(user=self.user, name="tag1")
+        self.client.get(TAGS_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url(tag.id), {'name': 'tag2'})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual([t['name'] for t in res.data], ['tag2'])
+
+    def test_recipe_link_invalidates_cache(self):
+        """Test linking a tag to a recipe refreshes the assigned_only list"""
+        tag = Tag.objects.create(user=self.user, name="tag1")
+        recipe = Recipe.objects.create(user=self.user, title='Soup')
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.tags.add(tag)
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual([t['name'] for t in res.data], ['tag1'])
+
+    def test_ingredient_change_keeps_tag_cache(self):
+        """Test ingredient writes do not invalidate cached tag lists"""
+        self.client.get(TAGS_URL)
+        attr_list_cache.reset_stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(user=self.user, name='salt')
+        self.client.get(TAGS_URL)
+
+        self.assertEqual(attr_list_cache.stats()['hits'], 1)
+        self.assertEqual(attr_list_cache.stats()['invalidations'], 1)
+
     def test_tag_update(self):
         """Test updating  a tag"""
         tag = Tag.objects.create(user=self.user, name='Dinner')
@@ -71,6 +146,16 @@ class PrivateTestAPI(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(tag.name, payload['name'])
 
+    def test_tag_update_to_existing_name_error(self):
+        """Test renaming a tag onto another tag's name is rejected"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+        url = detail_url(tag.id)
+        res = self.client.patch(url, {'name': 'Dinner'})
+        tag.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(tag.name, 'Lunch')
+
     def test_delete_tag(self):
         """Test delete tag"""
         tag = Tag.objects.create(user=self.user, name='Breakfast')
@@ -2,15 +2,16 @@
 URLs for recipe APIs
 """
 from django.urls import path, include
-from .views import IngredientViewset, RecipeViewSet, TagViewSet
-from rest_framework.routers import DefaultRouter
+from .routers import BulkRouter
+from .views import AttrListCacheStatsView, IngredientViewset, RecipeViewSet, TagViewSet
 
-router = DefaultRouter()
+router = BulkRouter()
 app_name = 'recipe'
 router.register('recipes', RecipeViewSet)
 router.register('tags', TagViewSet)
 router.register('ingredients', IngredientViewset)
 
 urlpatterns = [
+    path('cache-stats/', AttrListCacheStatsView.as_view(), name='cache-stats'),
     path('', include(router.urls))
 ]
@@ -1,6 +1,8 @@
 """
 Views for recipe APIs
 """
+import os
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -8,24 +10,71 @@ from drf_spectacular.utils import (
     OpenApiTypes,
 )
 
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import Http404, StreamingHttpResponse
+
+from core import renderers
+from core.media import media_file_response
 from core.models import Ingredient, Recipe, Tag
 from recipe.serializers import (IngredientSerializer,
                                 RecipeDetailSerializer,
                                 RecipeSerializer,
                                 TagSerializer,
                                 RecipeImageSerializer)
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from recipe.cache import attr_list_cache
+from recipe.bulk import RecipeBulkOperations, RecipeImporter, iter_ndjson
+from recipe.export import EXPORT_FORMATS, csv_lines, iter_recipes, ndjson_lines
+from recipe.image_cache import resized_image_cache
+from recipe.images import FORMATS, VARIANTS
+from recipe.mixins import CachedListMixin, ConditionalGetMixin, RowListMixin
+from recipe.negotiation import FileContentNegotiation
+from recipe.tasks import schedule_variants
+from recipe.uploadhandler import HashingFileUploadHandler
+from recipe.filters import MATCH_ALL, MATCH_ANY, filter_by_related
+from recipe.search import search_recipes
+from recipe.rows import RecipeRowSerializer
+from recipe.pagination import EstimatedCountPagination, RecipeCursorPagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import (mixins,
                             viewsets,
                             status)
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from user.authentication import CachedTokenAuthentication
+
+
+RELATED_MODELS = {'tags': Tag, 'ingredients': Ingredient}
+
+# Columnar JSON and MessagePack cut payload size for clients syncing big lists.
+RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + [renderers.ColumnarJSONRenderer]
+if renderers.msgpack is not None:
+    RENDERER_CLASSES.append(renderers.MessagePackRenderer)
+
+FIELDSET_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description='Comma separated list of fields to return. Defaults to all.',
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description=(
+            'Comma separated list of tags and ingredients to render nested. '
+            'When given, relations not listed render as lists of IDs.'
+        ),
+    ),
+]
 
 
 @extend_schema_view(
+    retrieve=extend_schema(parameters=FIELDSET_PARAMETERS),
     list=extend_schema(
-        parameters=[
+        parameters=FIELDSET_PARAMETERS + [
             OpenApiParameter(
                 'tags',
                 OpenApiTypes.STR,
@@ -36,15 +85,36 @@ from rest_framework.response import Response
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter',
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=[MATCH_ANY, MATCH_ALL],
+                description=(
+                    'Whether recipes must have any (default) or all of the '
+                    'requested tags and ingredients.'
+                ),
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description=(
+                    'Text matched against title, description, tag and ingredient '
+                    'names. Results are ordered by rank unless paginated.'
+                ),
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, RowListMixin, viewsets.ModelViewSet):
     """View for manage User API"""
     queryset = Recipe.objects.all()
     serializer_class = RecipeDetailSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    pagination_class = RecipeCursorPagination
+    export_chunk_size = 2000
+    import_batch_size = 1000
+    bulk_max_items = 500
 
     def _params_to_ints(self, qs):
         return [int(str_id) for str_id in qs.split(',')]
@@ -53,19 +123,94 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Retrieve recipes for authenticated user."""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        search = self.request.query_params.get('search')
+        match = self.request.query_params.get('match', MATCH_ANY)
         queryset = self.queryset
+        ordering = ['id']
+
+        if match not in (MATCH_ANY, MATCH_ALL):
+            raise ValidationError({'match': f'Must be "{MATCH_ANY}" or "{MATCH_ALL}".'})
 
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = filter_by_related(queryset, 'tags', tag_ids, match)
 
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = filter_by_related(queryset, 'ingredients', ingredient_ids, match)
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('id').distinct()
+        if search:
+            queryset = search_recipes(queryset, search)
+            ordering = ['-rank', 'id']
+
+        queryset = queryset.filter(user=self.request.user).order_by(*ordering)
+        return self._select_fieldset(queryset)
+
+    def _sparse_fieldset(self):
+        """Return the requested (fields, expand) names for read actions."""
+        if self.action not in ('list', 'retrieve'):
+            return None, None
+        if hasattr(self, '_fieldset'):
+            return self._fieldset
+
+        serializer_class = self.get_serializer_class()
+        fieldset = []
+        for param, allowed in (
+            ('fields', serializer_class.Meta.fields),
+            ('expand', serializer_class.expandable_fields),
+        ):
+            value = self.request.query_params.get(param)
+            if value is None:
+                fieldset.append(None)
+                continue
+            names = [name for name in value.split(',') if name]
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                raise ValidationError({param: f'Unknown fields: {", ".join(unknown)}.'})
+            fieldset.append(names)
+
+        self._fieldset = tuple(fieldset)
+        return self._fieldset
+
+    def _select_fieldset(self, queryset):
+        """Only fetch the columns and relations the response renders."""
+        if self.action not in ('list', 'retrieve'):
+            return queryset.defer('search_vector').prefetch_related(
+                *(self._prefetch(name) for name in RELATED_MODELS)
+            )
+
+        fields, expand = self._sparse_fieldset()
+        if fields is None:
+            fields = self.get_serializer_class().Meta.fields
+        columns = {field.name for field in Recipe._meta.concrete_fields}
+        queryset = queryset.only('id', *(name for name in fields if name in columns))
+        return queryset.prefetch_related(*(
+            self._prefetch(name, ids_only=expand is not None and name not in expand)
+            for name in RELATED_MODELS if name in fields
+        ))
+
+    def _prefetch(self, name, ids_only=False):
+        """Prefetch a relation in id order, optionally loading only ids."""
+        queryset = RELATED_MODELS[name].objects.order_by('id')
+        if ids_only:
+            queryset = queryset.only('id')
+        return Prefetch(name, queryset=queryset)
+
+    def get_row_serializer(self):
+        """Return the row serializer rendering the list action."""
+        fields, expand = self._sparse_fieldset()
+        if fields is None:
+            fields = self.get_serializer_class().Meta.fields
+        return RecipeRowSerializer(fields, expand)
+
+    def get_serializer(self, *args, **kwargs):
+        """Pass the requested fieldset to read action serializers."""
+        if self.action in ('list', 'retrieve'):
+            kwargs['fields'], kwargs['expand'] = self._sparse_fieldset()
+        return super().get_serializer(*args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
 
     def get_serializer_class(self):
         """Changing the default behaviour of serializer class"""
@@ -80,18 +225,175 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        """Create a recipe, or many from a list payload."""
+        if isinstance(request.data, list):
+            return self._bulk_response(request, 'create')
+        return super().create(request, *args, **kwargs)
+
+    @extend_schema(request=OpenApiTypes.OBJECT, responses={200: OpenApiTypes.OBJECT})
+    def bulk_partial_update(self, request, *args, **kwargs):
+        """Partially update many recipes given as objects with an id."""
+        return self._bulk_response(request, 'partial_update')
+
+    @extend_schema(request=OpenApiTypes.OBJECT, responses={200: OpenApiTypes.OBJECT})
+    def bulk_destroy(self, request, *args, **kwargs):
+        """Delete many recipes given as a list of ids."""
+        return self._bulk_response(request, 'destroy')
+
+    def _bulk_response(self, request, operation):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({
+                'non_field_errors': [f'At most {self.bulk_max_items} items are allowed.'],
+            })
+        operations = RecipeBulkOperations(request.user, self.get_serializer_context())
+        results = getattr(operations, operation)(items)
+        return Response(results, status=status.HTTP_200_OK)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """Upload an image to recipe."""
+        # Stream uploads to disk so they are never held in memory whole,
+        # hashing them for content addressed storage.
+        request._request.upload_handlers = [
+            HashingFileUploadHandler(request._request),
+        ]
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save()
+            # Variants are rendered in the background, the response
+            # reports them as pending.
+            schedule_variants(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        request={'application/x-ndjson': OpenApiTypes.BINARY},
+        responses={200: OpenApiTypes.OBJECT},
+        description=(
+            'Import one recipe per line of an NDJSON body. Valid lines are '
+            'committed in batches, invalid ones are reported by line number.'
+        ),
+    )
+    @action(methods=['POST'], detail=False, url_path='import')
+    def import_recipes(self, request):
+        """Create recipes from a streamed NDJSON body."""
+        importer = RecipeImporter(request.user, batch_size=self.import_batch_size)
+        summary = importer.run(iter_ndjson(request.stream))
+        return Response(summary, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'fmt',
+                OpenApiTypes.STR, enum=list(EXPORT_FORMATS),
+                description='Export format, ndjson by default.',
+            ),
+        ],
+        responses={
+            (200, 'application/x-ndjson'): OpenApiTypes.BINARY,
+            (200, 'text/csv'): OpenApiTypes.BINARY,
+        },
+    )
+    @action(
+        methods=['GET'], detail=False,
+        content_negotiation_class=FileContentNegotiation,
+    )
+    def export(self, request):
+        """Stream all recipes matching the list filters."""
+        fmt = request.query_params.get('fmt', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            raise ValidationError({'fmt': f'Must be one of {", ".join(EXPORT_FORMATS)}.'})
+
+        recipes = iter_recipes(self.get_queryset(), self.export_chunk_size)
+        lines = ndjson_lines(recipes) if fmt == 'ndjson' else csv_lines(recipes)
+        content_type, filename = EXPORT_FORMATS[fmt]
+        response = StreamingHttpResponse(lines, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'w',
+                OpenApiTypes.INT,
+                description=(
+                    'Requested width in pixels, rounded up to the next '
+                    'configured width. Defaults to the largest one.'
+                ),
+            ),
+            OpenApiParameter(
+                'fmt',
+                OpenApiTypes.STR, enum=list(FORMATS),
+                description='Image format, jpeg by default.',
+            ),
+        ],
+        responses={(200, 'image/*'): OpenApiTypes.BINARY},
+    )
+    @action(
+        methods=['GET'], detail=True, url_path='image',
+        content_negotiation_class=FileContentNegotiation,
+    )
+    def image(self, request, pk=None):
+        """Return the recipe image resized to a configured width."""
+        fmt = request.query_params.get('fmt', 'jpeg')
+        if fmt not in FORMATS:
+            raise ValidationError({'fmt': f'Must be one of {", ".join(FORMATS)}.'})
+        width = request.query_params.get('w')
+        if width is None:
+            width = max(settings.RECIPE_IMAGE_WIDTHS)
+        else:
+            try:
+                width = int(width)
+            except ValueError:
+                raise ValidationError({'w': 'Must be a positive integer.'})
+            if width < 1:
+                raise ValidationError({'w': 'Must be a positive integer.'})
+
+        recipe = self.get_object()
+        if not recipe.image:
+            raise Http404
+        width = resized_image_cache.bucket(width)
+        file = resized_image_cache.open(recipe.image.path, recipe.image.name, width, fmt)
+        path = resized_image_cache.path(recipe.image.name, width, fmt)
+        return media_file_response(
+            os.path.relpath(path, settings.MEDIA_ROOT), FORMATS[fmt][2], file=file
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'variant',
+                OpenApiTypes.STR, enum=list(VARIANTS),
+                description='Rendered variant to return instead of the original.',
+            ),
+        ],
+        responses={(200, 'image/*'): OpenApiTypes.BINARY},
+    )
+    @action(
+        methods=['GET'], detail=True, url_path='image-file',
+        content_negotiation_class=FileContentNegotiation,
+    )
+    def image_file(self, request, pk=None):
+        """Return the stored recipe image or one of its variants."""
+        recipe = self.get_object()
+        if not recipe.image:
+            raise Http404
+        variant = request.query_params.get('variant')
+        if variant is None:
+            return media_file_response(recipe.image.name)
+        if variant not in VARIANTS:
+            raise ValidationError({'variant': f'Must be one of {", ".join(VARIANTS)}.'})
+        if recipe.image_status != Recipe.IMAGE_READY or variant not in recipe.image_variants:
+            raise Http404
+        return media_file_response(recipe.image_variants[variant])
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -104,13 +406,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseAttrRecipeViewset(mixins.ListModelMixin,
+class BaseAttrRecipeViewset(ConditionalGetMixin,
+                            CachedListMixin,
+                            mixins.ListModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.DestroyModelMixin, viewsets.GenericViewSet):
     """Base viewset for recipe attributes"""
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    pagination_class = EstimatedCountPagination
+    list_cache = attr_list_cache
 
     def get_queryset(self):
         """Filter queryset to authenticated user."""
@@ -119,11 +426,15 @@ class BaseAttrRecipeViewset(mixins.ListModelMixin,
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            relation = queryset.model.recipe_set
+            links = relation.through.objects.filter(
+                **{f'{relation.field.m2m_reverse_field_name()}_id': OuterRef('pk')}
+            )
+            queryset = queryset.filter(Exists(links))
 
         return queryset.filter(
             user=self.request.user
-        ).order_by('-name').distinct()
+        ).order_by('-name')
 
 
 class TagViewSet(BaseAttrRecipeViewset):
@@ -136,3 +447,12 @@ class IngredientViewset(BaseAttrRecipeViewset):
     """Manage ingredients in the database"""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+
+
+class AttrListCacheStatsView(APIView):
+    """Report attribute list cache counters of the serving worker."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(attr_list_cache.stats())
@@ -0,0 +1,133 @@
+"""Tests for cached token authentication"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+ME_URL = reverse('user:me')
+AUTH_CACHE_URL = reverse('user:auth-cache')
+
+
+def create_user(**params):
+    """Create and return a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the token cache used for authentication"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = create_user(email='test@example.com', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_second_lookup_is_cached(self):
+        """Test a repeated token lookup does not query the database"""
+        self.auth.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+        self.assertEqual(token_cache.stats()['misses'], 1)
+
+    def test_cached_user_is_copied(self):
+        """Test changes to a returned user do not leak into the cache"""
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        user.name = 'Changed'
+
+        cached_user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertNotEqual(cached_user.name, 'Changed')
+
+    def test_deleted_token_invalidated(self):
+        """Test a deleted token is rejected immediately"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(token_cache.stats()['invalidations'], 1)
+
+    def test_deactivated_user_invalidated(self):
+        """Test tokens of a deactivated user are rejected immediately"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    @override_settings(TOKEN_CACHE_MAX_SIZE=1)
+    def test_least_recently_used_evicted(self):
+        """Test the cache drops the oldest entry past its size"""
+        other = create_user(email='other@example.com', password='testpass123')
+        other_token = Token.objects.create(user=other)
+        self.auth.authenticate_credentials(self.token.key)
+        self.auth.authenticate_credentials(other_token.key)
+
+        self.assertEqual(token_cache.stats()['size'], 1)
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+
+    @patch('user.authentication.time.monotonic')
+    def test_expired_entry_reloaded(self, patched_monotonic):
+        """Test entries older than the TTL are looked up again"""
+        patched_monotonic.return_value = 100
+        self.auth.authenticate_credentials(self.token.key)
+        patched_monotonic.return_value = 100 + token_cache.ttl + 1
+
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+
+
+class AuthCacheApiTests(TestCase):
+    """Test requests authenticated through the token cache"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.client = APIClient()
+
+    def test_token_request_uses_cache(self):
+        """Test repeated requests with a token skip the token query"""
+        user = create_user(email='test@example.com', password='testpass123')
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], user.email)
+
+    def test_stats_require_admin(self):
+        """Test cache counters are only visible to staff users"""
+        user = create_user(email='test@example.com', password='testpass123')
+        self.client.force_authenticate(user)
+
+        res = self.client.get(AUTH_CACHE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats_for_admin(self):
+        """Test staff users can read the cache counters"""
+        admin = get_user_model().objects.create_superuser('admin@example.com', 'testpass123')
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(AUTH_CACHE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hits', res.data)
+        self.assertIn('misses', res.data)
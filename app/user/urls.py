@@ -7,6 +7,7 @@ urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.AuthTokenView.as_view(), name='token'),
     path('me/', views.ManageUserApi.as_view(), name='me'),
+    path('auth-cache/', views.AuthCacheStatsView.as_view(), name='auth-cache'),
 
 
 ]
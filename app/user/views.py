@@ -3,10 +3,13 @@ Views for the user API.
 """
 
 from rest_framework import generics
+from .authentication import CachedTokenAuthentication, token_cache
 from .serializers import UserSerializer, AuthTokenSerializer
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
-from rest_framework import authentication, permissions
+from rest_framework.views import APIView
+from rest_framework import permissions
 
 # Create your views here.
 
@@ -25,8 +28,17 @@ class AuthTokenView(ObtainAuthToken):
 
 class ManageUserApi(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         return self.request.user
+
+
+class AuthCacheStatsView(APIView):
+    """Report token cache counters of the worker serving the request."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(token_cache.stats())
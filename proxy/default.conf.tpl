@@ -1,6 +1,17 @@
 server {
     listen ${LISTEN_PORT};
 
+    # Media is only served after the app authorizes it, see
+    # MEDIA_ACCEL_REDIRECT_PREFIX in the app settings.
+    location /static/media {
+        return 404;
+    }
+
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
+    }
+
     location /static {
         alias /vol/static;
     }
@@ -13,4 +24,3 @@ server {
     }
 }
 
-